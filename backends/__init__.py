@@ -0,0 +1,6 @@
+##
+## backends
+## This package contains an Exchange subclass for each supported exchange.
+## A backend (and the exchange's SDK) is only imported once its exchange is chosen,
+## see the exchanges registry in exchange.py.
+##
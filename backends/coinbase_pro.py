@@ -0,0 +1,149 @@
+##
+## coinbase_pro.py
+## This file contains the Coinbase Pro backend of Exchange.
+##
+
+from time import sleep
+import re
+import cbpro
+import requests
+import exchange
+import fixed_point
+
+# Reads a field of a Coinbase Pro ticker straight from the response bytes
+ticker_fields = {
+    'price': re.compile(rb'"price"\s*:\s*"([^"]*)"'),
+    'bid': re.compile(rb'"bid"\s*:\s*"([^"]*)"'),
+    'ask': re.compile(rb'"ask"\s*:\s*"([^"]*)"')
+}
+
+## CoinbasePro
+## A CoinbasePro object is an Exchange that trades on Coinbase Pro
+##
+## client - The authenticated cbpro client
+## account_id - The ID of the user's USD account
+## public_client - The public cbpro client
+## session - The requests session used to get the ticker
+## ticker_url - The URL of the coin's ticker
+class CoinbasePro(exchange.Exchange):
+
+    # Coinbase Pro allows 3 public requests per second with bursts of 6
+    rate_limit = (3, 6, 2)
+
+    ##
+    ## Ask for the API passphrase, key and secret (see Exchange.prompt_credentials)
+    ##
+    @classmethod
+    def prompt_credentials(cls):
+        passphrase = input('What is your passphrase? ')
+        api_key = input('What is your API key? ')
+        api_secret = input('What is your API secret key? ')
+        return '', passphrase, api_key, api_secret
+
+    ##
+    ## Login to Coinbase Pro and get the coin's increments and the USD balance
+    ##
+    def login(self):
+        self.client = cbpro.AuthenticatedClient(self.api_key, self.api_secret, self.passphrase)
+        self.account_id = input('What\'s your account ID (ex: 7d0f7d8e-dd34-4d9c-a846-06f431c381ba)?: ')
+
+        self.public_client = cbpro.PublicClient()
+        self.session = requests.Session()
+        self.watch_session(self.client.session)
+        self.watch_session(self.public_client.session)
+        self.watch_session(self.session)
+        self.ticker_url = self.public_client.url + '/products/' + self.coin + '-USD/ticker'
+
+        # Get the price and size increments of the coin
+        for product in self.request('order', self.public_client.get_products):
+            if product['id'] == self.coin+'-USD':
+                self.price_decimals = fixed_point.increment_decimals(product['quote_increment'])[0]
+                self.size_decimals, self.size_step = fixed_point.increment_decimals(product['base_increment'])
+                break
+        else:
+            print('ERROR: Coinbase Pro doesn\'t trade ' + self.coin + '-USD')
+            quit()
+
+        self.balance = fixed_point.to_ticks(self.request('order', self.client.get_account, self.account_id)['available'], self.price_decimals)
+
+    ##
+    ## Buy the coin with a market order for all of balance
+    ##
+    def market_buy(self):
+        order = self.place_order('Buy', self.client.buy, product_id=self.coin+'-USD', order_type='market', funds=fixed_point.from_ticks(self.balance, self.price_decimals))
+        status = self.wait_for_order(order, 'Buy')
+        self.crypto_balance += fixed_point.to_ticks(status['filled_size'], self.size_decimals)
+        self.balance -= fixed_point.to_ticks(status['executed_value'], self.price_decimals) + fixed_point.to_ticks(status['fill_fees'], self.price_decimals)
+
+    ##
+    ## Sell all of crypto_balance with a market order
+    ##
+    def market_sell(self):
+        order = self.place_order('Sell', self.client.sell, product_id=self.coin+'-USD', order_type='market', size=fixed_point.from_ticks(self.crypto_balance, self.size_decimals))
+        status = self.wait_for_order(order, 'Sell')
+        self.crypto_balance -= fixed_point.to_ticks(status['filled_size'], self.size_decimals)
+        self.balance += fixed_point.to_ticks(status['executed_value'], self.price_decimals) - fixed_point.to_ticks(status['fill_fees'], self.price_decimals)
+
+    ##
+    ## Wait for an order to finish
+    ##
+    ## @param order
+    ##      The order placed
+    ##
+    ## @param side
+    ##      'Buy' or 'Sell', for the error message
+    ##
+    ## @return
+    ##      The status of the finished order
+    ##
+    def wait_for_order(self, order, side):
+        status = self.request('order', self.client.get_order, order['id'])
+        while status.get('status') in ('pending', 'open', 'active'):
+            sleep(0.2)
+            status = self.request('order', self.client.get_order, order['id'])
+
+        # Canceled orders are removed, so they aren't found anymore
+        if status.get('status') != 'done':
+            print('ERROR: ' + side + ' order canceled')
+            quit()
+        return status
+
+    ##
+    ## Get the price of one coin, reading it straight from the ticker response
+    ##
+    ## @param price_mode
+    ##      Specifies if the funcition will return the bid price, ask price, or the last trade price
+    ##
+    ## @param priority
+    ##      'poll' when polling the price, 'order' when the price is part of a trade
+    ##
+    ## @return
+    ##      The current price of the coin, in ticks
+    ##
+    def get_price(self, price_mode='None', priority='poll'):
+        ticker = self.request(priority, self.get_ticker)
+        field = 'price'
+        if self.sandbox:
+            field = 'bid' if price_mode == 'bid' else 'ask'
+        price = ticker_fields[field].search(ticker)
+        if price is None:
+            print('ERROR: No ' + field + ' in the Coinbase Pro ticker: ' + ticker.decode(errors='replace'))
+            quit()
+        return fixed_point.to_ticks(price.group(1), self.price_decimals)
+
+    ##
+    ## Get the ticker of the coin without decoding it
+    ##
+    ## @return
+    ##      The body of the response
+    ##
+    def get_ticker(self):
+        return self.session.get(self.ticker_url, timeout=30).content
+
+    ##
+    ## Drop the connections the clients keep open (see Exchange.reset_connections)
+    ##
+    def reset_connections(self):
+        self.session.close()
+        self.client.session.close()
+        self.public_client.session.close()
@@ -0,0 +1,136 @@
+##
+## robinhood.py
+## This file contains the Robinhood backend of Exchange.
+##
+
+from time import sleep
+import robin_stocks.robinhood as r
+import exchange
+import fixed_point
+
+# The number of failed look ups in a row before giving up on an order
+order_lookup_attempts = 25
+
+## Robinhood
+## A Robinhood object is an Exchange that trades on Robinhood
+class Robinhood(exchange.Exchange):
+
+    # Robinhood doesn't publish its limits, so these are kept conservative
+    rate_limit = (2, 4, 1)
+
+    ##
+    ## Ask for the email and password (see Exchange.prompt_credentials)
+    ##
+    @classmethod
+    def prompt_credentials(cls):
+        username = input('What is your email? ')
+        passphrase = input('What is your password? ')
+        return username, passphrase, '', ''
+
+    ##
+    ## Login to Robinhood and get the coin's increments and the USD balance
+    ##
+    def login(self):
+        self.watch_session(r.globals.SESSION)
+        try:
+            login = r.login(username=self.username, password=self.passphrase, store_session=False)
+        except:
+            print('Cannot login with the provided credentials.')
+            quit()
+
+        # Get the price and size increments of the coin
+        info = self.request('order', r.get_crypto_info, self.coin)
+        if info is None:
+            print('ERROR: Robinhood doesn\'t trade ' + self.coin)
+            quit()
+        self.price_decimals = fixed_point.increment_decimals(info['min_order_price_increment'])[0]
+        self.size_decimals, self.size_step = fixed_point.increment_decimals(info['min_order_quantity_increment'])
+
+        self.balance = self.get_cash()
+
+    ##
+    ## Buy the coin with all of balance
+    ##
+    def market_buy(self):
+        order = self.place_order('Buy', r.order_buy_crypto_by_price, self.coin, float(fixed_point.from_ticks(self.balance, self.price_decimals)))
+        status = self.wait_for_order(order, 'Buy')
+        self.crypto_balance += fixed_point.to_ticks(status['cumulative_quantity'], self.size_decimals)
+        self.balance -= fixed_point.to_ticks(status['rounded_executed_notional'], self.price_decimals)
+
+    ##
+    ## Sell all of crypto_balance
+    ##
+    def market_sell(self):
+        order = self.place_order('Sell', r.order_sell_crypto_by_quantity, self.coin, float(fixed_point.from_ticks(self.crypto_balance, self.size_decimals)))
+        status = self.wait_for_order(order, 'Sell')
+        self.crypto_balance -= fixed_point.to_ticks(status['cumulative_quantity'], self.size_decimals)
+        self.balance += fixed_point.to_ticks(status['rounded_executed_notional'], self.price_decimals)
+
+    ##
+    ## Wait for an order to be filled
+    ##
+    ## @param order
+    ##      The order placed
+    ##
+    ## @param side
+    ##      'Buy' or 'Sell', for the error message
+    ##
+    ## @return
+    ##      The info of the filled order
+    ##
+    def wait_for_order(self, order, side):
+        failures = 0
+        status = self.request('order', r.get_crypto_order_info, order['id'])
+        while status is None or status.get('state') not in ('filled', 'canceled', 'rejected', 'failed'):
+
+            # robin_stocks returns None for any error (such as an expired session),
+            # so give up once the order can't be looked up anymore
+            if status is None:
+                failures += 1
+                if failures >= order_lookup_attempts:
+                    print('ERROR: Could not look up the ' + side.lower() + ' order ' + order['id'] + ', check the account on Robinhood')
+                    quit()
+            else:
+                failures = 0
+            sleep(0.2)
+            status = self.request('order', r.get_crypto_order_info, order['id'])
+
+        if status['state'] != 'filled':
+            print('ERROR: ' + side + ' order ' + status['state'])
+            quit()
+        return status
+
+    ##
+    ## Get how much USD the account holds
+    ##
+    ## @return
+    ##      The USD balance, in ticks
+    ##
+    def get_cash(self):
+        return fixed_point.to_ticks(self.request('order', r.load_account_profile)['portfolio_cash'], self.price_decimals)
+
+    ##
+    ## Get the price of one coin
+    ##
+    ## @param price_mode
+    ##      Specifies if the funcition will return the bid price, ask price, or the mark price
+    ##
+    ## @param priority
+    ##      'poll' when polling the price, 'order' when the price is part of a trade
+    ##
+    ## @return
+    ##      The current price of the coin, in ticks
+    ##
+    def get_price(self, price_mode='None', priority='poll'):
+        quote = self.request(priority, r.get_crypto_quote, self.coin)
+        if self.sandbox:
+            if price_mode == 'bid':
+                return fixed_point.to_ticks(quote['bid_price'], self.price_decimals)
+            return fixed_point.to_ticks(quote['ask_price'], self.price_decimals)
+        return fixed_point.to_ticks(quote['mark_price'], self.price_decimals)
+
+    ##
+    ## Drop the connections of the logged in session (see Exchange.reset_connections)
+    ##
+    def reset_connections(self):
+        r.globals.SESSION.close()
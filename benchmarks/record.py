@@ -0,0 +1,54 @@
+##
+## record.py
+## This file records the prices of a coin from a live exchange as a tick dataset
+## for the replay benchmark (benchmarks/data/<name>.csv, with the columns time,price).
+## The prices are polled the same way the auto-trader polls them, so the dataset has
+## the timing of a real feed (uneven gaps, repeated prices, slowdowns when rate limited).
+##
+## Usage:
+##   python3 benchmarks/record.py NAME [TICKS]
+## Records TICKS prices (3000 by default), or until Ctrl+C. Then run
+##   python3 benchmarks/replay.py recorded_NAME --update
+## to save the dataset's baseline.
+##
+
+import csv
+import os
+import sys
+from time import sleep
+import time
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import exchange
+import fixed_point
+import trader
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        print('Usage: python3 benchmarks/record.py NAME [TICKS]')
+        quit()
+    count = int(sys.argv[2]) if len(sys.argv) == 3 else 3000
+
+    crypto_exchange = exchange.generate_exchange()
+    os.makedirs(os.path.join(BENCHMARK_DIR, 'data'), exist_ok=True)
+    path = os.path.join(BENCHMARK_DIR, 'data', sys.argv[1]+'.csv')
+
+    with open(path, 'w', newline='') as ticks_file:
+        writer = csv.writer(ticks_file)
+        writer.writerow(['time', 'price'])
+        start = time.time()
+        recorded = 0
+        try:
+            while recorded < count:
+                sleep(crypto_exchange.scheduler.poll_delay(trader.sleep_time))
+                price = crypto_exchange.get_price()
+                writer.writerow(['%.3f' % (time.time()-start), fixed_point.from_ticks(price, crypto_exchange.price_decimals)])
+                recorded += 1
+        except KeyboardInterrupt:
+            pass
+    print('Recorded '+str(recorded)+' ticks to '+path)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,430 @@
+##
+## replay.py
+## This file is the regression and performance benchmark of the trading loop.
+## It replays fixed tick datasets through the AutoTrader (see trader.py) with a
+## fake exchange, and checks that the trades made are exactly the same as in the
+## saved baselines, while reporting how fast the trading loop is (relative to a
+## calibration loop, so the speeds of different machines can be compared).
+##
+## The datasets are:
+##   trending - A random walk that rises and falls in long trends
+##   mean_reverting - Prices pulled back towards $100 (mostly sideways noise)
+##   flash_crash - A calm market that crashes below the sell floor
+##   large_tree - Sideways prices run through trees of 127 linked conditions
+## Any recorded ticks saved as benchmarks/data/<name>.csv (with the columns
+## time,price) are replayed as well (as recorded_<name>), using the conditions in
+## benchmarks/conditions. benchmarks/record.py records them from a live exchange.
+## The shipped irregular_feed.csv is not real market data: it is a fixture in the
+## recorded format with the timing of a polled feed (uneven gaps, rate limit
+## slowdowns, a 45 second reconnect) and repeated prices, which the generated
+## datasets don't have.
+##
+## Usage:
+##   python3 benchmarks/replay.py                Compare against benchmarks/baselines.json
+##   python3 benchmarks/replay.py --update       Save the results as the new baselines
+##   python3 benchmarks/replay.py --check-speed  Fail if a scenario got 20% slower (instead of 50%)
+##
+
+import argparse
+import contextlib
+import csv
+import glob
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCHMARK_DIR))
+
+import condition
+import fixed_point
+import trader
+
+# The time in seconds between ticks of the generated datasets (same as the auto-trader)
+TICK_TIME = 0.2
+
+# The price increment (cents) and size increment (0.00000001 coins) of the fake exchange
+PRICE_DECIMALS = 2
+SIZE_DECIMALS = 8
+SIZE_STEP = 1
+
+# The funds the fake exchange starts with
+START_FUNDS = '1000'
+
+# How much slower than the baseline (relative to the calibration loop) a scenario
+# can always be, as a fraction. --check-speed uses the stricter --tolerance instead.
+MAX_SLOWDOWN = 0.5
+
+
+## ReplayExchange
+## A ReplayExchange acts like an Exchange in sandbox mode, trading at the price of
+## the tick being replayed and recording every trade. Like Exchange, a buy or sell
+## that can't trade one order size increment does nothing, so only the trades a
+## sandbox run would actually make are recorded.
+##
+## coin - The name of the coin that is being traded
+## price_decimals - The number of decimal places in one tick
+## size_decimals - The number of decimal places in the order size increment
+## size_step - The order size increment, in units of size_decimals
+## balance - The USD balance, in ticks
+## crypto_balance - The amount of the coin owned, in units of size_decimals
+## price - The price of the tick being replayed, in ticks
+## index - The index of the tick being replayed
+## trades - Every trade made, as '<tick index> buy' or '<tick index> sell'
+class ReplayExchange:
+    def __init__(self, funds):
+        self.coin = 'BTC'
+        self.price_decimals = PRICE_DECIMALS
+        self.size_decimals = SIZE_DECIMALS
+        self.size_step = SIZE_STEP
+        self.balance = fixed_point.to_ticks(funds, PRICE_DECIMALS)
+        self.crypto_balance = 0
+        self.price = 0
+        self.index = 0
+        self.trades = []
+
+    def get_price(self, price_mode='None'):
+        return self.price
+
+    def round_size(self, size):
+        return size - size % self.size_step
+
+    def buy(self):
+        if self.balance*10**self.size_decimals < self.size_step*self.price:
+            return
+        bought = self.round_size(self.balance*10**self.size_decimals//self.price)
+        self.crypto_balance += bought
+        self.balance -= -(-bought*self.price//10**self.size_decimals)
+        self.trades.append(str(self.index)+' buy')
+
+    def sell(self):
+        if self.crypto_balance < self.size_step:
+            return
+        self.balance += self.price*self.crypto_balance//10**self.size_decimals
+        self.crypto_balance = 0
+        self.trades.append(str(self.index)+' sell')
+
+
+##
+## Turn generated prices into ticks
+##
+## @param prices
+##      A list of prices
+##
+## @return
+##      A list of (price, time) ticks, with the prices rounded to cents
+##
+def to_ticks(prices):
+    return [('%.2f' % price, i*TICK_TIME) for i, price in enumerate(prices)]
+
+def trending_ticks(count=20000, seed=1):
+    rng = random.Random(seed)
+    price = 100
+    prices = []
+    for i in range(count):
+        drift = 0.0002 if (i//4000) % 2 == 0 else -0.00015
+        price *= math.exp(drift + 0.001*rng.gauss(0, 1))
+        prices.append(price)
+    return to_ticks(prices)
+
+def mean_reverting_ticks(count=20000, seed=2):
+    rng = random.Random(seed)
+    price = 100
+    prices = []
+    for i in range(count):
+        price += 0.01*(100-price) + 0.08*rng.gauss(0, 1)
+        prices.append(price)
+    return to_ticks(prices)
+
+def flash_crash_ticks(count=8000, seed=3):
+    rng = random.Random(seed)
+    price = 100
+    prices = []
+    for i in range(count):
+        if i < count-500:
+            price *= math.exp(0.0005*rng.gauss(0, 1))
+        else:
+            price = max(price*0.99, 40)
+        prices.append(price)
+    return to_ticks(prices)
+
+##
+## Read recorded ticks from a csv file with the columns time,price
+##
+def recorded_ticks(path):
+    with open(path, newline='') as ticks_file:
+        return [(row['price'], float(row['time'])) for row in csv.DictReader(ticks_file)]
+
+##
+## Write a tree of linked conditions, where condition i links to condition (i-1)/2,
+## so the leaves start and every branch ends at condition 0
+##
+## @param directory
+##      The directory to write buy-conditions.conf and sell-conditions.conf to
+##
+## @param size
+##      The number of conditions in each tree
+##
+def write_condition_tree(directory, size):
+    buy = []
+    sell = []
+    for i in range(size):
+        interval = 10 + (i % 7)*10
+        link = '' if i == 0 else 'NEXT_LINK=c'+str((i-1)//2)+'\n'
+        buy.append('[c'+str(i)+']\nPERCENT_UP='+str(0.5 + (i % 5)*0.2)+'\nFROM_UP=INTERVAL_PRICE\nINTERVAL='+str(interval)+'\n')
+        sell.append('[c'+str(i)+']\nPERCENT_DOWN='+str(0.5 + (i % 5)*0.2)+'\nFROM_DOWN=INTERVAL_PRICE\nINTERVAL='+str(interval)+'\n')
+        if link:
+            buy[-1] += 'PRICE_DOWN='+str(0.5 + (i % 3)*0.5)+'\nFROM_DOWN=TRADE_PRICE\n'+link
+            sell[-1] += 'PRICE_UP='+str(0.5 + (i % 3)*0.5)+'\nFROM_UP=TRADE_PRICE\n'+link
+    with open(os.path.join(directory, 'buy-conditions.conf'), 'w') as conf:
+        conf.write('\n'.join(buy))
+    with open(os.path.join(directory, 'sell-conditions.conf'), 'w') as conf:
+        conf.write('\n'.join(sell))
+
+##
+## Run the trading loop over the ticks
+##
+## @param ticks
+##      A list of (price, time) ticks
+##
+## @param conditions_dir
+##      The directory containing the buy/sell condition config files
+##
+## @param sell_floor
+##      The sell floor in dollars (0 if none)
+##
+## @param latencies
+##      A list to add the time of each tick to (in nanoseconds), or None
+##
+## @return
+##      Every trade made, as '<tick index> buy', '<tick index> sell' or '<tick index> floor'
+##
+def replay(ticks, conditions_dir, sell_floor, latencies=None):
+    prices = [fixed_point.to_ticks(price, PRICE_DECIMALS) for price, _ in ticks]
+    buy_conditions = condition.load_trade_conditions('buy', conditions_dir, PRICE_DECIMALS)
+    sell_conditions = condition.load_trade_conditions('sell', conditions_dir, PRICE_DECIMALS)
+    replay_exchange = ReplayExchange(START_FUNDS)
+    replay_exchange.price = prices[0]
+    auto_trader = trader.AutoTrader(replay_exchange, buy_conditions, sell_conditions, fixed_point.to_ticks_ceil(sell_floor, PRICE_DECIMALS), prices[0])
+
+    clock = time.perf_counter_ns
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for index in range(len(ticks)):
+            start = clock()
+            if auto_trader.reset:
+                auto_trader.start_after_trade(replay_exchange.price)
+            replay_exchange.index = index
+            replay_exchange.price = prices[index]
+            running = auto_trader.tick(prices[index], ticks[index][1])
+            if latencies is not None:
+                latencies.append(clock()-start)
+            if not running:
+                replay_exchange.trades.append(str(index)+' floor')
+                break
+    return replay_exchange.trades
+
+##
+## Time a fixed loop of the same kind of work as a tick (integer comparisons and
+## keeping a window of recent values), so speeds can be compared between machines
+##
+## @return
+##      The loops per second of the fastest of a few runs
+##
+def calibrate(count=100000, repeat=3):
+    best = None
+    for _ in range(repeat):
+        window = []
+        low = high = 0
+        start = time.perf_counter()
+        for value in range(count):
+            window.append((value*7919 % 10007, value))
+            if len(window) > 50:
+                window.pop(0)
+            for price, _ in reversed(window[-10:]):
+                if price > high:
+                    high = price
+                elif price < low:
+                    low = price
+        run_total = time.perf_counter()-start
+        if best is None or run_total < best:
+            best = run_total
+    return count/best
+
+##
+## Get a percentile of sorted values
+##
+def percentile(values, percent):
+    return values[min(len(values)-1, int(len(values)*percent/100))]
+
+##
+## Run a scenario, a few times for the timings (keeping the fastest run) and
+## once for the peak memory. The speed is also given relative to calibrate(),
+## run right before, which is what is compared against the baselines.
+##
+## @return
+##      The results of the scenario
+##
+def run_scenario(ticks, conditions_dir, sell_floor, repeat=3):
+    calibration = calibrate()
+    total = None
+    for _ in range(repeat):
+        run_latencies = []
+        start = time.perf_counter()
+        trades = replay(ticks, conditions_dir, sell_floor, run_latencies)
+        run_total = time.perf_counter()-start
+        if total is None or run_total < total:
+            total = run_total
+            latencies = run_latencies
+
+    tracemalloc.start()
+    memory_trades = replay(ticks, conditions_dir, sell_floor)
+    peak_memory = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if memory_trades != trades:
+        raise RuntimeError('The trades changed between two runs of the same ticks')
+
+    latencies.sort()
+    return {
+        'ticks': len(latencies),
+        'trades': trades,
+        'ticks_per_sec': round(len(latencies)/total),
+        'relative_speed': round(len(latencies)/total/calibration, 4),
+        'peak_memory_kb': round(peak_memory/1024),
+        'latency_us': {
+            'p50': round(percentile(latencies, 50)/1000, 2),
+            'p95': round(percentile(latencies, 95)/1000, 2),
+            'p99': round(percentile(latencies, 99)/1000, 2),
+            'max': round(latencies[-1]/1000, 2)
+        }
+    }
+
+##
+## Run every scenario
+##
+## @param names
+##      The names of the scenarios to run (every scenario if empty)
+##
+## @return
+##      A dictionary of the results of each scenario
+##
+def run_scenarios(names):
+    default_conditions = os.path.join(BENCHMARK_DIR, 'conditions')
+    scenarios = {
+        'trending': (trending_ticks, default_conditions, 0),
+        'mean_reverting': (mean_reverting_ticks, default_conditions, 0),
+        'flash_crash': (flash_crash_ticks, default_conditions, 60),
+        'large_tree': (lambda: mean_reverting_ticks(3000, seed=4), None, 0)
+    }
+    for path in sorted(glob.glob(os.path.join(BENCHMARK_DIR, 'data', '*.csv'))):
+        scenarios['recorded_'+os.path.splitext(os.path.basename(path))[0]] = (lambda path=path: recorded_ticks(path), default_conditions, 0)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tree_dir:
+        write_condition_tree(tree_dir, 127)
+        for name, (ticks, conditions_dir, sell_floor) in scenarios.items():
+            if names and name not in names:
+                continue
+            results[name] = run_scenario(ticks(), conditions_dir or tree_dir, sell_floor)
+            result = results[name]
+            print('%-24s %6d ticks %4d trades %9d ticks/sec (%.4f relative)  p50 %7.2fus  p95 %7.2fus  p99 %7.2fus  peak %6d KB' % (
+                name, result['ticks'], len(result['trades']), result['ticks_per_sec'], result['relative_speed'],
+                result['latency_us']['p50'], result['latency_us']['p95'], result['latency_us']['p99'],
+                result['peak_memory_kb']))
+    return results
+
+##
+## Get how much faster (positive) or slower (negative) than its baseline a scenario was
+##
+## @return
+##      The change in relative speed, as a fraction
+##
+def speed_change(result, baseline):
+    return result['relative_speed']/baseline['relative_speed']-1
+
+##
+## Compare the results against the baselines
+##
+## @param tolerance
+##      How much bigger than the baseline a scenario can be (and how much slower, with
+##      check_speed), as a fraction
+##
+## @param check_speed
+##      True if a scenario slower than the tolerance fails, otherwise only one slower
+##      than MAX_SLOWDOWN does
+##
+## @return
+##      A list of the failures
+##
+def compare(results, baselines, tolerance, check_speed):
+    failures = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None:
+            print('No baseline for '+name+' (run with --update to save one)')
+            continue
+
+        if result['trades'] != baseline['trades']:
+            index = 0
+            while index < min(len(result['trades']), len(baseline['trades'])) and result['trades'][index] == baseline['trades'][index]:
+                index += 1
+            failures.append(name+': the trades changed at trade '+str(index)+' ('+str(len(baseline['trades']))+' trades before, '+str(len(result['trades']))+' now)')
+
+        # The speeds are relative to the calibration loop, so they can be compared on any machine.
+        # Timings are still noisy, so only a large slowdown fails unless asked for
+        change = speed_change(result, baseline)
+        print('%-24s speed %+.0f%% against the baseline' % (name, 100*change))
+        if change < -(tolerance if check_speed else MAX_SLOWDOWN):
+            failures.append(name+': relative speed '+str(result['relative_speed'])+', down from '+str(baseline['relative_speed'])+' ('+'%.0f' % (-100*change)+'% slower)')
+
+        if result['peak_memory_kb'] > baseline['peak_memory_kb']*(1+tolerance):
+            failures.append(name+': peak memory '+str(result['peak_memory_kb'])+' KB, up from '+str(baseline['peak_memory_kb']))
+    return failures
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay tick datasets through the trading loop.')
+    parser.add_argument('scenarios', nargs='*', help='the scenarios to run (default: all)')
+    parser.add_argument('--update', action='store_true', help='save the results as the new baselines')
+    parser.add_argument('--baselines', default=os.path.join(BENCHMARK_DIR, 'baselines.json'), help='the baselines file')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed slowdown or memory growth as a fraction (default: 0.2)')
+    parser.add_argument('--check-speed', action='store_true', help='fail if a scenario is slower than the tolerance, instead of only if it is 50%% slower (on a quiet machine)')
+    args = parser.parse_args()
+
+    results = run_scenarios(args.scenarios)
+
+    baselines = {}
+    if os.path.exists(args.baselines):
+        with open(args.baselines) as baselines_file:
+            baselines = json.load(baselines_file)
+
+    if args.update:
+        baselines.update(results)
+        with open(args.baselines, 'w') as baselines_file:
+            json.dump(baselines, baselines_file, indent=1, sort_keys=True)
+            baselines_file.write('\n')
+        print('Saved the baselines to '+args.baselines)
+        return
+
+    # A scenario that looks too slow is run once more (keeping its faster run), so one
+    # noisy run doesn't fail the benchmark
+    limit = args.tolerance if args.check_speed else MAX_SLOWDOWN
+    slow = [name for name in results if name in baselines and speed_change(results[name], baselines[name]) < -limit]
+    if slow:
+        print('Running '+', '.join(slow)+' again to check the speed')
+        for name, result in run_scenarios(slow).items():
+            if result['relative_speed'] > results[name]['relative_speed']:
+                results[name] = result
+
+    failures = compare(results, baselines, args.tolerance, args.check_speed)
+    for failure in failures:
+        print('FAIL: '+failure)
+    if failures:
+        sys.exit(1)
+    print('All scenarios match their baselines')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,438 @@
+##
+## cluster.py
+## This file contains the multi-process mode of the auto-trader, for running
+## many sets of trading conditions (strategies) on the same coin at once.
+##
+## One feed process gets the price of the coin and writes it into a TickRing in
+## shared memory. Every strategy runs in its own worker process, reading the prices
+## straight out of the shared memory. The trades of every worker go to a single
+## order router process, which makes the exchange calls one at a time and keeps
+## track of how much of the account belongs to each strategy.
+##
+## The exchange is logged into once, before the processes are forked, so each
+## process inherits the logged in exchange (this needs the "fork" start method,
+## so it runs on Linux and macOS). The exchange's RequestScheduler is moved into
+## shared memory first, so every process makes its requests from the same bucket.
+##
+## Usage:
+##   python3 cluster.py Strategies/A Strategies/B ...
+## where each directory contains a buy-conditions.conf and a sell-conditions.conf.
+## The account's USD balance is split evenly between the strategies.
+##
+
+import multiprocessing
+from multiprocessing import shared_memory
+import os
+import queue
+import signal
+import sys
+from time import sleep
+import time
+import condition
+import exchange
+import fixed_point
+import trader
+
+# The time in seconds between price retrievals
+sleep_time = 0.2
+
+# The number of prices the TickRing holds before overwriting the oldest
+ring_capacity = 4096
+
+
+## TickRing
+## A TickRing is a ring buffer of prices and times in shared memory, written by
+## one process and read by any number of others.
+##
+## The shared memory holds the number of ticks ever written, followed by the prices
+## (in ticks) and the times of the last capacity ticks. A tick is written into its
+## slot before the count is increased, so readers only ever see finished ticks.
+##
+## capacity - The number of ticks held
+## shm - The SharedMemory block
+## count - The number of ticks ever written (count[0])
+## prices - The prices of the ticks, by slot
+## times - The times of the ticks, by slot
+class TickRing:
+    def __init__(self, _capacity, name=None):
+        self.capacity = _capacity
+        size = 8 + 16*_capacity
+        self.shm = shared_memory.SharedMemory(name=name, create=name is None, size=size)
+        self.count = self.shm.buf[:8].cast('q')
+        self.prices = self.shm.buf[8:8+8*_capacity].cast('q')
+        self.times = self.shm.buf[8+8*_capacity:size].cast('d')
+        if name is None:
+            self.count[0] = 0
+
+    ##
+    ## Write a new tick (only one process may write)
+    ##
+    ## @param price
+    ##      The price in ticks
+    ##
+    ## @param tick_time
+    ##      The time of the price in seconds
+    ##
+    def write(self, price, tick_time):
+        n = self.count[0]
+        slot = n % self.capacity
+        self.prices[slot] = price
+        self.times[slot] = tick_time
+        self.count[0] = n + 1
+
+    ##
+    ## Read a tick
+    ##
+    ## @param n
+    ##      The number of the tick (0 for the first tick ever written)
+    ##
+    ## @return
+    ##      (price, time), or None if the tick has already been overwritten
+    ##
+    def read(self, n):
+        slot = n % self.capacity
+        price = self.prices[slot]
+        tick_time = self.times[slot]
+
+        # The writer may have started overwriting the slot while it was being read
+        if self.count[0] - n >= self.capacity:
+            return None
+        return price, tick_time
+
+    ##
+    ## Detach from the shared memory
+    ##
+    def close(self):
+        self.count.release()
+        self.prices.release()
+        self.times.release()
+        self.shm.close()
+
+
+## RouterError
+## Raised in a worker when its trade failed or the order router stopped, which stops the strategy
+class RouterError(Exception):
+    pass
+
+
+## RouterExchange
+## A RouterExchange stands in for the Exchange in a worker process, sending every
+## trade to the order router and waiting for the strategy's new balances.
+##
+## worker_id - The number of the worker
+## coin - The name of the coin that is being traded
+## price_decimals - The number of decimal places in one tick of the price
+## size_decimals - The number of decimal places in the order size increment
+## balance - The strategy's USD balance, in ticks
+## crypto_balance - The strategy's amount of the coin, in units of size_decimals
+## orders - The queue of trades to the order router
+## replies - The queue of (balance, crypto_balance, error) replies from the order router
+## router_stopped - An Event that is set when the order router process is gone
+class RouterExchange:
+    def __init__(self, _worker_id, crypto_exchange, _balance, _orders, _replies, _router_stopped):
+        self.worker_id = _worker_id
+        self.coin = crypto_exchange.coin
+        self.price_decimals = crypto_exchange.price_decimals
+        self.size_decimals = crypto_exchange.size_decimals
+        self.balance = _balance
+        self.crypto_balance = 0
+        self.orders = _orders
+        self.replies = _replies
+        self.router_stopped = _router_stopped
+
+    def buy(self):
+        self.trade('buy')
+
+    def sell(self):
+        self.trade('sell')
+
+    ##
+    ## Send a trade to the order router and wait for the strategy's new balances.
+    ## The wait lasts as long as the order router is running (even after Ctrl+C,
+    ## so a trade in progress is still recorded).
+    ##
+    ## @param action
+    ##      'buy' or 'sell'
+    ##
+    def trade(self, action):
+        self.orders.put((self.worker_id, action))
+        while True:
+            try:
+                self.balance, self.crypto_balance, error = self.replies.get(timeout=1)
+                break
+            except queue.Empty:
+                if self.router_stopped.is_set():
+                    raise RouterError('the order router stopped during the '+action+', check the account')
+        if error is not None:
+            raise RouterError(error)
+
+
+##
+## The feed process. Gets the price of the coin and writes it into the TickRing.
+##
+## @param crypto_exchange
+##      The logged in Exchange
+##
+## @param ring_name
+##      The name of the TickRing's shared memory
+##
+## @param stop
+##      An Event that is set when the feed should stop
+##
+def run_feed(crypto_exchange, ring_name, stop):
+
+    # Ctrl+C is handled by the main process, which stops everything in order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    crypto_exchange.reset_connections()
+    ring = TickRing(ring_capacity, ring_name)
+    while not stop.is_set():
+        sleep(crypto_exchange.scheduler.poll_delay(sleep_time))
+        ring.write(crypto_exchange.get_price(), time.time())
+    ring.close()
+
+##
+## The order router process. Makes every trade of every worker, one at a time.
+## Each strategy only trades with its own share of the account.
+##
+## @param crypto_exchange
+##      The logged in Exchange
+##
+## @param names
+##      The name of each strategy
+##
+## @param balances
+##      The starting USD balance of each strategy, in ticks
+##
+## @param orders
+##      The queue of (worker_id, 'buy' or 'sell') trades, ending with None
+##
+## @param replies
+##      The queue of each worker to send its new balances (and the error of a failed trade) to
+##
+def run_router(crypto_exchange, names, balances, orders, replies):
+
+    # Ctrl+C is handled by the main process, which stops everything in order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    crypto_exchange.reset_connections()
+    ledgers = [[balance, 0] for balance in balances]
+    while True:
+        order = orders.get()
+        if order is None:
+            break
+        worker_id, action = order
+
+        # Trade with only this strategy's share of the account.
+        # A failed trade (including a quit() in the exchange) only stops its strategy,
+        # and the worker always gets a reply
+        error = None
+        try:
+            crypto_exchange.balance, crypto_exchange.crypto_balance = ledgers[worker_id]
+            if action == 'buy':
+                crypto_exchange.buy()
+            else:
+                crypto_exchange.sell()
+            ledgers[worker_id] = [crypto_exchange.balance, crypto_exchange.crypto_balance]
+        except Exception as exception:
+            error = 'the '+action+' failed ('+repr(exception)+'), check the account on '+crypto_exchange.exchange_name
+        except SystemExit:
+            error = 'the '+action+' failed, check the account on '+crypto_exchange.exchange_name
+        replies[worker_id].put((ledgers[worker_id][0], ledgers[worker_id][1], error))
+
+        # After every trade, the USD balance and crypto balance of each strategy and the request metrics are printed to Account_Holdings.txt
+        account_holdings = open('Account-Holdings.txt', 'a')
+        account_holdings.truncate(0)
+        for name, ledger in zip(names, ledgers):
+            account_holdings.write(name+': '+fixed_point.from_ticks(ledger[0], crypto_exchange.price_decimals)+' USD, '+fixed_point.from_ticks(ledger[1], crypto_exchange.size_decimals)+' '+crypto_exchange.coin+'\n')
+        account_holdings.write(crypto_exchange.scheduler.summary())
+        account_holdings.close()
+
+##
+## A worker process. Runs one strategy's trading conditions on every price in the TickRing.
+##
+## @param router_exchange
+##      The RouterExchange of the worker
+##
+## @param directory
+##      The directory containing the strategy's buy/sell condition config files
+##
+## @param ring_name
+##      The name of the TickRing's shared memory
+##
+## @param sell_floor
+##      The sell floor in ticks
+##
+## @param stop
+##      An Event that is set when the worker should stop
+##
+def run_worker(router_exchange, directory, ring_name, sell_floor, stop):
+
+    # Ctrl+C is handled by the main process, which stops everything in order
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    name = os.path.basename(os.path.normpath(directory))
+    price_decimals = router_exchange.price_decimals
+    buy_conditions = condition.generate_and_validate_trade_conditions('buy', directory, price_decimals)
+    sell_conditions = condition.generate_and_validate_trade_conditions('sell', directory, price_decimals)
+    condition_watcher = condition.ConditionWatcher(buy_conditions, sell_conditions, directory, price_decimals=price_decimals)
+    condition_watcher.start()
+    ring = TickRing(ring_capacity, ring_name)
+    try:
+        run_strategy(name, router_exchange, buy_conditions, sell_conditions, condition_watcher, ring, sell_floor, stop)
+    except RouterError as error:
+        print(name + ': STOPPED, ' + str(error))
+    ring.close()
+
+##
+## Run a strategy's trading conditions on every price in the TickRing, until the
+## price goes below the sell floor or the worker is stopped
+##
+## @param name
+##      The name of the strategy, for the messages
+##
+## @param router_exchange
+##      The RouterExchange of the worker
+##
+## @param buy_conditions
+##      The buy TradeConditions
+##
+## @param sell_conditions
+##      The sell TradeConditions
+##
+## @param condition_watcher
+##      The ConditionWatcher of the strategy's config files
+##
+## @param ring
+##      The TickRing
+##
+## @param sell_floor
+##      The sell floor in ticks
+##
+## @param stop
+##      An Event that is set when the worker should stop
+##
+def run_strategy(name, router_exchange, buy_conditions, sell_conditions, condition_watcher, ring, sell_floor, stop):
+
+    # Wait for the first price
+    while ring.count[0] == 0:
+        if stop.is_set():
+            return
+        sleep(sleep_time/10)
+    n = ring.count[0] - 1
+    crypto_price = ring.read(n)[0]
+    auto_trader = trader.AutoTrader(router_exchange, buy_conditions, sell_conditions, sell_floor, crypto_price)
+
+    while not stop.is_set():
+        count = ring.count[0]
+        if count == n + 1:
+            sleep(sleep_time/10)
+            continue
+
+        # If this worker fell a whole ring behind, skip to the oldest price still held
+        if count - (n + 1) >= ring.capacity:
+            print(name + ': SKIPPED ' + str(count - ring.capacity - n) + ' PRICES')
+            n = count - ring.capacity
+
+        while n + 1 < count:
+            n += 1
+            tick = ring.read(n)
+            if tick is None:
+                continue
+
+            if auto_trader.reset:
+                auto_trader.start_after_trade(crypto_price)
+
+            condition_update = condition_watcher.take_update()
+            if condition_update is not None:
+                auto_trader.swap_conditions(condition_update)
+
+            crypto_price = tick[0]
+            if not auto_trader.tick(crypto_price, tick[1]):
+                print(name + ': STOPPED AT THE SELL FLOOR')
+                return
+
+##
+## Run every strategy given on the command line
+##
+def main():
+    directories = sys.argv[1:]
+    if not directories:
+        print('Usage: python3 cluster.py STRATEGY_DIRECTORY [STRATEGY_DIRECTORY ...]')
+        quit()
+    context = multiprocessing.get_context('fork')
+
+    # Generate the crypto exchange (the only login)
+    crypto_exchange = exchange.generate_exchange()
+
+    # The price feed and the order router share one token bucket, so together they
+    # stay under the exchange's rate limit and orders keep their reserved tokens
+    crypto_exchange.scheduler.share(context)
+
+    # Check every strategy before starting anything
+    for directory in directories:
+        condition.generate_and_validate_trade_conditions('buy', directory, crypto_exchange.price_decimals)
+        condition.generate_and_validate_trade_conditions('sell', directory, crypto_exchange.price_decimals)
+
+    # The sell floor (sells everything and stops every strategy)
+    sell_floor = condition.generate_sell_floor(crypto_exchange.price_decimals)
+
+    # Split the USD balance between the strategies
+    names = [os.path.basename(os.path.normpath(directory)) for directory in directories]
+    balances = [crypto_exchange.balance//len(directories)]*len(directories)
+
+    ring = TickRing(ring_capacity)
+    stop = context.Event()
+    router_stopped = context.Event()
+    orders = context.Queue()
+    replies = [context.Queue() for _ in directories]
+
+    feed = context.Process(target=run_feed, args=(crypto_exchange, ring.shm.name, stop))
+    router = context.Process(target=run_router, args=(crypto_exchange, names, balances, orders, replies))
+    workers = []
+    for worker_id, directory in enumerate(directories):
+        router_exchange = RouterExchange(worker_id, crypto_exchange, balances[worker_id], orders, replies[worker_id], router_stopped)
+        workers.append(context.Process(target=run_worker, args=(router_exchange, directory, ring.shm.name, sell_floor, stop)))
+
+    feed.start()
+    router.start()
+    for worker in workers:
+        worker.start()
+
+    print('--------------------------------------')
+    print('           Done configuring')
+    print('    The auto-trader is now running')
+    print('      with ' + str(len(workers)) + ' strategies')
+    print('--------------------------------------')
+
+    # Runs until every strategy stopped, the price feed or order router stopped, or Ctrl+C
+    try:
+        while any(worker.is_alive() for worker in workers):
+            if not router.is_alive():
+                print('ERROR: The order router stopped, stopping every strategy')
+                break
+            if not feed.is_alive():
+                print('ERROR: The price feed stopped, stopping every strategy')
+                break
+            sleep(sleep_time)
+    except KeyboardInterrupt:
+        pass
+    stop.set()
+
+    # Let the order router finish the trades in progress before the workers stop.
+    # Workers only give up on a trade if the order router is gone (or on a second Ctrl+C)
+    while any(worker.is_alive() for worker in workers):
+        try:
+            if not router.is_alive():
+                router_stopped.set()
+            sleep(sleep_time)
+        except KeyboardInterrupt:
+            router_stopped.set()
+    orders.put(None)
+    router.join()
+    feed.join()
+    ring.close()
+    ring.shm.unlink()
+
+if __name__ == '__main__':
+    main()
@@ -1,277 +1,617 @@
-##
-## condition.py
-## This file contains all relevant information regarding the use of TradeConditions.
-## This includes the class TradeCondition itself, the TradeCondition functions, and a 
-## function generate_and_validate_trade_conditions which generates the TradeConditions.
-##
-
-import configparser
-import glob
-
-
-## TradeCondition
-## A TradeCondition objects represents either a buy or sell trade condition.
-##
-## condition_id - The unique ID of the condition
-## percent_up - If the price goes up X%, from Y
-## price_up - If the price goes up $X, from Y
-## from_up - Either from the minimum price in the interval (0), or the minimum price since the time of last trade (1)
-## percent_down - If the price goes down X%, from Y
-## price_down - If the price goes down $X, from Y
-## from_down - Either from the maximum price in the interval (0), or the maximum price since the time of last trade (1)
-## interval - The interval being looked at (in seconds)
-## next_link - The next TradeCondition that must be exceeded before the current trade condition is analyzed (-1 if no next link)
-## in_range - 'True' if the condition can potentially be run or is currently being run, 'False' if the condition can't be run (used for linking TradeConditions)
-## is_run - 'True' if the condition is being run or has been run already on this interval, 'False' if otherwise
-## A CONDITION CAN ONLY RUN WHEN in_range AND is_run ARE BOTH TRUE
-## has_previous - Whether a condition has a condition below itself
-class TradeCondition:
-    def __init__(self, c_id, prcnt_up, prc_up, frm_up, prcnt_down, prc_down, frm_dn, intrvl, link, previous):
-        self.condition_id = c_id
-        self.percent_up = 1+(prcnt_up/100)
-        self.price_up = prc_up
-        self.from_up = frm_up
-        self.percent_down = 1-(prcnt_down/100)
-        self.price_down = prc_down
-        self.from_down = frm_dn
-        self.interval = intrvl
-        self.next_link = link
-        self.in_range = True
-        self.is_run = False
-        
-        self.run = False
-        self.has_previous = previous
-    
-    ##
-    ## Custom boolean equal
-    ##
-    ## @param other
-    ##      another TradeCondition to see if it is the same as the current TradeCondition
-    ##
-    ## @return
-    ##      True if the two are the same, False if they aren't
-    def __eq__(self, other):
-        if type(other).__name__ != 'TradeCondition':
-            return False
-        if self.condition_id == other.condition_id:
-            return True
-        return False
-    
-    ##
-    ## Reset in_range and is_run after a trade is complete
-    ##
-    def reset_availability(self):
-        self.in_range = True
-        self.is_run = False
-
-
-##
-## Generates and validates the trade conditions that a user creates.
-## If all of the trading conditions are created correctly by the user, this
-## function returns a list of all of the trading conditions generated.
-## Otherwise, it will quit and throw an error.
-##
-## @param mode
-##      Either "buy" or "sell"
-##
-## @return
-##      A list of trading conditions
-##
-def generate_and_validate_trade_conditions(mode):
-    conditions = []
-    config = configparser.ConfigParser()
-    config.read('TradeConditions/'+mode+'-conditions.conf')
-    # NOTE: ^^^ maybe add a try catch here. Causes error for condition with same name, more than one of the same variable in a condition
-
-    # Exits if there are no buy/sell conditions
-    if len(config.sections()) == 0:
-        print('ERROR: No '+mode+' conditions')
-        quit()
-
-    # Goes through every trade condition in the config file
-    for condition in config.sections():
-
-        # Variables representing what the TradeCondition object contains.
-        percent_up=0
-        price_up=0
-        from_up=-1
-        percent_down=0
-        price_down=0
-        from_down=-1
-        interval=0
-        next_link=''
-
-        # Represents if the price/percent up/down element of a trade condition is present
-        p_up_present = 0
-        p_down_present = 0
-        
-        # Goes through every value in the trade condition
-        for val in config[condition]:
-            if val.upper() == 'PERCENT_UP':
-
-                # If there isn't also PRICE_UP present
-                if not p_up_present:
-                    percent_up=float(config[condition][val])
-                    p_up_present=1
-                else:
-                    print('ERROR: Both PERCENT_UP and PRICE_UP present in '+condition)
-                    quit()
-
-            if val.upper() == 'PRICE_UP':
-
-                # If there isn't also PERCENT_UP present
-                if not p_up_present:
-                    price_up=float(config[condition][val])
-                    p_up_present=1
-                else:
-                    print('ERROR: Both PERCENT_UP and PRICE_UP present in '+condition)
-                    quit()
-
-            if val.upper() == 'FROM_UP':
-                if config[condition][val] == 'INTERVAL_PRICE':
-                    from_up=0
-                elif config[condition][val] == 'TRADE_PRICE':
-                    from_up=1
-                else:
-                    print('ERROR: \"'+config[condition][val]+'\" invalid value for FROM_UP in '+condition)
-                    quit()
-            
-            if val.upper() == 'PERCENT_DOWN':
-
-                # If there isn't also PRICE_DOWN present
-                if not p_down_present:
-                    percent_down=float(config[condition][val])
-                    p_down_present=1
-                else:
-                    print('ERROR: Both PERCENT_DOWN and PRICE_DOWN present in '+condition)
-                    quit()
-            
-            if val.upper() == 'PRICE_DOWN':
-
-                # If there isn't also PERCENT_DOWN present
-                if not p_down_present:
-                    price_down=float(config[condition][val])
-                    p_down_present=1
-                else:
-                    print('ERROR: Both PERCENT_DOWN and PRICE_DOWN present in '+condition)
-                    quit()
-            
-            if val.upper() == 'FROM_DOWN':
-                if config[condition][val] == 'INTERVAL_PRICE':
-                    from_down=0
-                elif config[condition][val] == 'TRADE_PRICE':
-                    from_down=1
-                else:
-                    print('ERROR: \"'+config[condition][val]+'\" invalid value for FROM_DOWN in '+condition)
-                    quit()
-            
-            if val.upper() == 'INTERVAL':
-                interval=float(config[condition][val])
-            
-            if val.upper() == 'NEXT_LINK':
-                next_link=config[condition][val]
-
-                # If the next_link referenced doesn't exist
-                if not config.has_section(next_link):
-                    print('ERROR: In trade condition ' + condition + ', no trade condition with the ID ' + next_link)
-                    quit()
-                
-                # If the next_link referenced is itself
-                if condition.lower() == config[condition][val].lower():
-                    print('ERROR: In trade condition ' + condition + ', invalid NEXT_LINK. NEXT_LINK cannnot be itself.')
-                    quit()
-
-        # Now gathering the variable assignments is done, but still need to check for more errors
-        
-        # Check for specific values of buy conditions
-        if mode == 'buy':
-
-            # If neither PRICE_UP or PERCENT_UP is present, throw an error
-            if not p_up_present:
-                print('ERROR: No PRICE_UP or PERCENT_UP in condition ' + condition)
-                quit()
-
-            # If there are conditions for a next link but nothing is provided for NEXT_LINK, throw an error
-            if (from_down > 0 or p_down_present) and not config[condition].get('next_link'):
-                print('ERROR: No NEXT_LINK prodvided in condition '+condition+' even though next link conditions are provided')
-                quit()
-
-            # If there are no conditions for a next link but NEXT_LINK is provided, throw an error
-            if (from_down < 0 or not p_down_present) and config[condition].get('next_link'):
-                print('ERROR: NEXT_LINK prodvided in condition '+condition+' but no next link conditions are provided')
-                quit()
-        
-        # Check for specific values of sell conditions
-        elif mode == 'sell':
-
-            # If neither PRICE_DOWN or PERCENT_DOWN is present, throw an error
-            if not p_down_present:
-                print('ERROR: No PRICE_DOWN or PERCENT_DOWN in condition ' + condition)
-                quit()
-
-            # If there are conditions for a next link but nothing is provided for NEXT_LINK, throw an error
-            if (from_up > 0 or p_up_present) and not config[condition].get('next_link'):
-                print('ERROR: No NEXT_LINK prodvided in condition '+condition+' even though next link conditions are provided')
-                quit()
-
-            # If there are no conditions for a next link but NEXT_LINK is provided, throw an error
-            if (from_up < 0 or not p_up_present) and config[condition].get('next_link'):
-                print('ERROR: NEXT_LINK prodvided in condition '+condition+' but no next link conditions are provided')
-                quit()
-        
-        # If there is no interval when there should be
-        if (from_up == 0 or from_down == 0) and interval <= 0:
-            print('ERROR: Invalid or nonexistant interval for condition ' + condition)
-            print('       or invalid use of FROM_UP and/or FROM_DOWN')
-            quit()
-
-        # If there is an interval but it isn't needed
-        if (from_up != 0 and from_down != 0) and interval > 0:
-            print('ERROR: INTERVAL is assigned when it is never needed in condition ' + condition)
-            print('       (the condition only uses TRADE_PRICE)')
-            quit()
-
-        # See what trade conditions have another trade condition with it as a next link
-        has_previous = 0
-        for temp_condition in config.sections():
-            if config[temp_condition].get('next_link') == condition:
-                has_previous = 1
-                break
-        
-        # Everything is correct, so add this condition to the main conditions list
-        conditions.append(TradeCondition(condition, percent_up, price_up, from_up, percent_down, price_down, from_down, interval, next_link, has_previous))
-
-    #
-    # Done adding trade conditions
-    #
-
-    # Makes the next_links actual TradeCondition objects
-    for condition in conditions:
-        if condition.next_link != '':
-            for next_condition in conditions:
-                if condition.next_link == next_condition.condition_id:
-                    condition.next_link = next_condition
-                    break
-
-    # Ensures there aren't any trade condition loops
-    for condition in conditions:
-        looping_condition = condition
-        end_of_loop = 0
-        while not end_of_loop:
-            if looping_condition.next_link != '':
-                looping_condition = looping_condition.next_link
-                if looping_condition == condition:
-                    print('ERROR: Looping trade conditions')
-                    quit()
-            else:
-                end_of_loop = 1
-
-    # Everything is correct. Return the generated conditions
-    return conditions
-
-def generate_sell_floor():
-    prompt_sell_floor = input('Would you like to add a sell floor? (Y/N) ')
-    if prompt_sell_floor.lower() == 'y' or prompt_sell_floor.lower() == 'yes':
-        return float(input('At what price should the floor be at? '))
-    else:
-        return 0
\ No newline at end of file
+##
+## condition.py
+## This file contains all relevant information regarding the use of TradeConditions.
+## This includes the class TradeCondition itself, the TradeCondition functions, a 
+## function generate_and_validate_trade_conditions which generates the TradeConditions,
+## and the class ConditionWatcher which reloads them while the auto-trader is running.
+##
+
+import configparser
+from decimal import Decimal
+from fractions import Fraction
+import hashlib
+import math
+import os
+import threading
+from time import sleep
+import time
+import fixed_point
+
+
+## TradeCondition
+## A TradeCondition objects represents either a buy or sell trade condition.
+##
+## condition_id - The unique ID of the condition
+## percent_up - If the price goes up X%, from Y
+## price_up - If the price goes up $X, from Y
+## from_up - Either from the minimum price in the interval (0), or the minimum price since the time of last trade (1)
+## percent_down - If the price goes down X%, from Y
+## price_down - If the price goes down $X, from Y
+## from_down - Either from the maximum price in the interval (0), or the maximum price since the time of last trade (1)
+## interval - The interval being looked at (in seconds)
+## next_link - The next TradeCondition that must be exceeded before the current trade condition is analyzed (-1 if no next link)
+## in_range - 'True' if the condition can potentially be run or is currently being run, 'False' if the condition can't be run (used for linking TradeConditions)
+## is_run - 'True' if the condition is being run or has been run already on this interval, 'False' if otherwise
+## A CONDITION CAN ONLY RUN WHEN in_range AND is_run ARE BOTH TRUE
+## has_previous - Whether a condition has a condition below itself
+##
+## The same thresholds in integer form, for comparing against prices in ticks
+## (worked out once per condition spec, see condition_ratios and build_trade_conditions):
+## up_num, up_den - percent_up as the fraction up_num/up_den
+## down_num, down_den - percent_down as the fraction down_num/down_den
+## price_up_ticks - price_up in ticks, rounded up
+## price_down_ticks - price_down in ticks, rounded up
+class TradeCondition:
+    def __init__(self, c_id, prcnt_up, prc_up, frm_up, prcnt_down, prc_down, frm_dn, intrvl, link, previous, ratios, ticks):
+        self.condition_id = c_id
+        self.percent_up = 1+(prcnt_up/100)
+        self.price_up = prc_up
+        self.from_up = frm_up
+        self.percent_down = 1-(prcnt_down/100)
+        self.price_down = prc_down
+        self.from_down = frm_dn
+        self.interval = intrvl
+        self.next_link = link
+        self.in_range = True
+        self.is_run = False
+        
+        self.run = False
+        self.has_previous = previous
+
+        self.up_num, self.up_den, self.down_num, self.down_den = ratios
+        self.price_up_ticks, self.price_down_ticks = ticks
+    
+    ##
+    ## Custom boolean equal
+    ##
+    ## @param other
+    ##      another TradeCondition to see if it is the same as the current TradeCondition
+    ##
+    ## @return
+    ##      True if the two are the same, False if they aren't
+    def __eq__(self, other):
+        if type(other).__name__ != 'TradeCondition':
+            return False
+        if self.condition_id == other.condition_id:
+            return True
+        return False
+    
+    ##
+    ## Reset in_range and is_run after a trade is complete
+    ##
+    def reset_availability(self):
+        self.in_range = True
+        self.is_run = False
+
+
+## ConditionError
+## Raised when a trade condition config file is invalid
+class ConditionError(Exception):
+    pass
+
+
+##
+## Generates and validates the trade conditions that a user creates.
+## If all of the trading conditions are created correctly by the user, this
+## function returns a list of all of the trading conditions generated.
+## Otherwise, it will quit and throw an error.
+##
+## @param mode
+##      Either "buy" or "sell"
+##
+## @param directory
+##      The directory containing the buy/sell condition config files
+##
+## @param price_decimals
+##      The number of decimal places in one tick of the price
+##
+## @return
+##      A list of trading conditions
+##
+def generate_and_validate_trade_conditions(mode, directory='TradeConditions', price_decimals=2):
+    try:
+        return load_trade_conditions(mode, directory, price_decimals)
+    except ConditionError as error:
+        print('ERROR: ' + str(error))
+        quit()
+
+##
+## Loads the trade conditions of a config file, raising a ConditionError
+## instead of quitting if the config file is invalid.
+##
+## Every step is linear in the number of conditions: the next links are resolved
+## through an ID index, has_previous comes from the in-degree of each condition,
+## and loops are found with a single topological sort. The validated file is
+## cached by its modification time and hash, so reloading an unchanged file
+## skips the parsing entirely.
+##
+## @param mode
+##      Either "buy" or "sell"
+##
+## @param directory
+##      The directory containing the buy/sell condition config files
+##
+## @param price_decimals
+##      The number of decimal places in one tick of the price
+##
+## @return
+##      A list of trading conditions
+##
+def load_trade_conditions(mode, directory='TradeConditions', price_decimals=2):
+    return build_trade_conditions(load_condition_specs(mode, directory+'/'+mode+'-conditions.conf'), price_decimals)
+
+##
+## Builds TradeCondition objects from validated condition specs
+##
+## @param specs
+##      A list of condition specs (see parse_condition_specs)
+##
+## @param price_decimals
+##      The number of decimal places in one tick of the price
+##
+## @return
+##      A list of trading conditions
+##
+def build_trade_conditions(specs, price_decimals=2):
+
+    # Build fresh TradeCondition objects, since their run flags change while trading.
+    # The price thresholds in ticks are kept in each spec, so rebuilding from cached
+    # specs doesn't convert them again
+    conditions = []
+    for spec in specs:
+        ticks = spec[11].get(price_decimals)
+        if ticks is None:
+            ticks = (fixed_point.to_ticks_ceil(spec[2], price_decimals), fixed_point.to_ticks_ceil(spec[5], price_decimals))
+            spec[11][price_decimals] = ticks
+        conditions.append(TradeCondition(*spec[:11], ticks))
+
+    # Makes the next_links actual TradeCondition objects
+    index = {}
+    for condition in conditions:
+        index[condition.condition_id] = condition
+    for condition in conditions:
+        if condition.next_link != '':
+            condition.next_link = index[condition.next_link]
+
+    # Everything is correct. Return the generated conditions
+    return conditions
+
+##
+## Makes only the conditions without a previous condition runnable, which is
+## where every branch starts after a trade
+##
+## @param conditions
+##      A list of trading conditions
+##
+def reset_run(conditions):
+    for i in conditions:
+        if not i.has_previous:
+            i.run = True
+        else:
+            i.run = False
+
+##
+## Get the longest interval of a list of trade conditions
+##
+## @param conditions
+##      A list of trading conditions
+##
+## @return
+##      The max interval in seconds
+##
+def max_interval(conditions):
+    max_interval_length = 0
+    for i in conditions:
+        if i.interval > max_interval_length:
+            max_interval_length = i.interval
+    return max_interval_length
+
+
+# Validated condition specs of every file read so far
+# path -> ((modification time, size, inode), hash of the file, specs)
+_condition_cache = {}
+
+# Files modified more recently than this (in nanoseconds) are always hashed, as a
+# filesystem with coarse timestamps can save the file again within the same time
+mtime_resolution = 2*10**9
+
+##
+## Reads a trade condition config file and returns the validated arguments of
+## each TradeCondition, using the cached result if the file hasn't changed.
+##
+## @param mode
+##      Either "buy" or "sell"
+##
+## @param path
+##      The path of the config file
+##
+## @return
+##      A list of condition specs (see parse_condition_specs), in the order of the file
+##
+def load_condition_specs(mode, path):
+    try:
+        stat = os.stat(path)
+        file_key = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        settled = time.time_ns() - stat.st_mtime_ns > mtime_resolution
+    except OSError:
+        file_key = None
+        settled = False
+
+    # Same modification time, size and inode long enough ago, so the file is unchanged
+    cached = _condition_cache.get(path)
+    if cached is not None and settled and cached[0] == file_key:
+        return cached[2]
+
+    try:
+        with open(path, 'rb') as config_file:
+            data = config_file.read()
+    except OSError:
+        data = b''
+
+    # Touched but not changed, so the previous result is still valid
+    digest = hashlib.sha1(data).hexdigest()
+    if cached is not None and cached[1] == digest:
+        _condition_cache[path] = (file_key, digest, cached[2])
+        return cached[2]
+
+    try:
+        text = data.decode()
+    except UnicodeDecodeError:
+        raise ConditionError(path+' is not a text file')
+
+    specs = parse_condition_specs(mode, text)
+    _condition_cache[path] = (file_key, digest, specs)
+    return specs
+
+##
+## Works out the percent thresholds of a condition as exact fractions
+##
+## @param percent_up
+##      PERCENT_UP of the condition (0 if not used)
+##
+## @param percent_down
+##      PERCENT_DOWN of the condition (0 if not used)
+##
+## @return
+##      (up_num, up_den, down_num, down_den), where 1 + percent_up/100 is up_num/up_den
+##      and 1 - percent_down/100 is down_num/down_den
+##
+def condition_ratios(percent_up, percent_down):
+    up = 1+Fraction(Decimal(repr(percent_up)))/100
+    down = 1-Fraction(Decimal(repr(percent_down)))/100
+    return up.numerator, up.denominator, down.numerator, down.denominator
+
+##
+## Converts a number in a trade condition config file
+##
+## @param value
+##      The value in the config file
+##
+## @param key
+##      The name of the value, for the error message
+##
+## @param condition
+##      The ID of the trade condition, for the error message
+##
+## @return
+##      The number as a float
+##
+def parse_number(value, key, condition):
+    try:
+        number = float(value)
+    except ValueError:
+        number = math.nan
+    if not math.isfinite(number):
+        raise ConditionError('\"'+value+'\" invalid value for '+key+' in '+condition)
+    return number
+
+##
+## Parses and validates the text of a trade condition config file
+##
+## @param mode
+##      Either "buy" or "sell"
+##
+## @param text
+##      The contents of the config file
+##
+## @return
+##      A list of condition specs, in the order of the file. Each spec holds the
+##      TradeCondition arguments up to has_previous, then the percent thresholds as
+##      fractions (see condition_ratios), then a dictionary of the price thresholds
+##      in ticks by price_decimals (filled in by build_trade_conditions)
+##
+def parse_condition_specs(mode, text):
+    specs = []
+    config = configparser.ConfigParser()
+
+    # Causes error for condition with same name, more than one of the same variable in a condition
+    try:
+        config.read_string(text)
+    except configparser.Error as error:
+        raise ConditionError(str(error))
+
+    sections = config.sections()
+
+    # Errors if there are no buy/sell conditions
+    if len(sections) == 0:
+        raise ConditionError('No '+mode+' conditions')
+
+    # Number of trade conditions that have each trade condition as a next link
+    in_degree = dict.fromkeys(sections, 0)
+
+    # Goes through every trade condition in the config file
+    for condition in sections:
+
+        # Variables representing what the TradeCondition object contains.
+        percent_up=0
+        price_up=0
+        from_up=-1
+        percent_down=0
+        price_down=0
+        from_down=-1
+        interval=0
+        next_link=''
+
+        # Represents if the price/percent up/down element of a trade condition is present
+        p_up_present = 0
+        p_down_present = 0
+
+        # Goes through every value in the trade condition
+        for val, value in config.items(condition):
+            key = val.upper()
+
+            if key == 'PERCENT_UP':
+
+                # If there isn't also PRICE_UP present
+                if not p_up_present:
+                    percent_up=parse_number(value, 'PERCENT_UP', condition)
+                    p_up_present=1
+                else:
+                    raise ConditionError('Both PERCENT_UP and PRICE_UP present in '+condition)
+
+            elif key == 'PRICE_UP':
+
+                # If there isn't also PERCENT_UP present
+                if not p_up_present:
+                    price_up=parse_number(value, 'PRICE_UP', condition)
+                    p_up_present=1
+                else:
+                    raise ConditionError('Both PERCENT_UP and PRICE_UP present in '+condition)
+
+            elif key == 'FROM_UP':
+                if value == 'INTERVAL_PRICE':
+                    from_up=0
+                elif value == 'TRADE_PRICE':
+                    from_up=1
+                else:
+                    raise ConditionError('\"'+value+'\" invalid value for FROM_UP in '+condition)
+
+            elif key == 'PERCENT_DOWN':
+
+                # If there isn't also PRICE_DOWN present
+                if not p_down_present:
+                    percent_down=parse_number(value, 'PERCENT_DOWN', condition)
+                    p_down_present=1
+                else:
+                    raise ConditionError('Both PERCENT_DOWN and PRICE_DOWN present in '+condition)
+
+            elif key == 'PRICE_DOWN':
+
+                # If there isn't also PERCENT_DOWN present
+                if not p_down_present:
+                    price_down=parse_number(value, 'PRICE_DOWN', condition)
+                    p_down_present=1
+                else:
+                    raise ConditionError('Both PERCENT_DOWN and PRICE_DOWN present in '+condition)
+
+            elif key == 'FROM_DOWN':
+                if value == 'INTERVAL_PRICE':
+                    from_down=0
+                elif value == 'TRADE_PRICE':
+                    from_down=1
+                else:
+                    raise ConditionError('\"'+value+'\" invalid value for FROM_DOWN in '+condition)
+
+            elif key == 'INTERVAL':
+                interval=parse_number(value, 'INTERVAL', condition)
+
+            elif key == 'NEXT_LINK':
+                next_link=value
+
+                # If the next_link referenced doesn't exist
+                if next_link not in in_degree:
+                    raise ConditionError('In trade condition ' + condition + ', no trade condition with the ID ' + next_link)
+
+                # If the next_link referenced is itself
+                if condition.lower() == next_link.lower():
+                    raise ConditionError('In trade condition ' + condition + ', invalid NEXT_LINK. NEXT_LINK cannnot be itself.')
+
+        # Now gathering the variable assignments is done, but still need to check for more errors
+
+        # Check for specific values of buy conditions
+        if mode == 'buy':
+
+            # If neither PRICE_UP or PERCENT_UP is present, throw an error
+            if not p_up_present:
+                raise ConditionError('No PRICE_UP or PERCENT_UP in condition ' + condition)
+
+            # If there are conditions for a next link but nothing is provided for NEXT_LINK, throw an error
+            if (from_down > 0 or p_down_present) and not next_link:
+                raise ConditionError('No NEXT_LINK prodvided in condition '+condition+' even though next link conditions are provided')
+
+            # If there are no conditions for a next link but NEXT_LINK is provided, throw an error
+            if (from_down < 0 or not p_down_present) and next_link:
+                raise ConditionError('NEXT_LINK prodvided in condition '+condition+' but no next link conditions are provided')
+
+        # Check for specific values of sell conditions
+        elif mode == 'sell':
+
+            # If neither PRICE_DOWN or PERCENT_DOWN is present, throw an error
+            if not p_down_present:
+                raise ConditionError('No PRICE_DOWN or PERCENT_DOWN in condition ' + condition)
+
+            # If there are conditions for a next link but nothing is provided for NEXT_LINK, throw an error
+            if (from_up > 0 or p_up_present) and not next_link:
+                raise ConditionError('No NEXT_LINK prodvided in condition '+condition+' even though next link conditions are provided')
+
+            # If there are no conditions for a next link but NEXT_LINK is provided, throw an error
+            if (from_up < 0 or not p_up_present) and next_link:
+                raise ConditionError('NEXT_LINK prodvided in condition '+condition+' but no next link conditions are provided')
+
+        # If there is no interval when there should be
+        if (from_up == 0 or from_down == 0) and interval <= 0:
+            raise ConditionError('Invalid or nonexistant interval for condition ' + condition + '\n       or invalid use of FROM_UP and/or FROM_DOWN')
+
+        # If there is an interval but it isn't needed
+        if (from_up != 0 and from_down != 0) and interval > 0:
+            raise ConditionError('INTERVAL is assigned when it is never needed in condition ' + condition + '\n       (the condition only uses TRADE_PRICE)')
+
+        if next_link:
+            in_degree[next_link] += 1
+
+        # Everything is correct, so add this condition to the main conditions list
+        # (has_previous is filled in once every next link is known)
+        specs.append([condition, percent_up, price_up, from_up, percent_down, price_down, from_down, interval, next_link, 0, condition_ratios(percent_up, percent_down), {}])
+
+    #
+    # Done adding trade conditions
+    #
+
+    # A condition has a previous condition if anything links to it
+    links = {}
+    for spec in specs:
+        spec[9] = 1 if in_degree[spec[0]] else 0
+        links[spec[0]] = spec[8]
+
+    # Ensures there aren't any trade condition loops.
+    # Topological sort: repeatedly remove the conditions nothing links to. Every
+    # condition has at most one next link, so anything left over is in a loop.
+    remaining = dict(in_degree)
+    ready = [condition for condition in sections if remaining[condition] == 0]
+    removed = 0
+    while ready:
+        link = links[ready.pop()]
+        removed += 1
+        if link:
+            remaining[link] -= 1
+            if remaining[link] == 0:
+                ready.append(link)
+    if removed != len(sections):
+        raise ConditionError('Looping trade conditions')
+
+    return [tuple(spec) for spec in specs]
+
+##
+## Asks the user for the sell floor
+##
+## @param price_decimals
+##      The number of decimal places in one tick of the price
+##
+## @return
+##      The sell floor in ticks (rounded up, since prices are always whole ticks), or 0 if there isn't one
+##
+def generate_sell_floor(price_decimals=2):
+    prompt_sell_floor = input('Would you like to add a sell floor? (Y/N) ')
+    if prompt_sell_floor.lower() == 'y' or prompt_sell_floor.lower() == 'yes':
+        return fixed_point.to_ticks_ceil(input('At what price should the floor be at? ').strip(), price_decimals)
+    else:
+        return 0
+
+## ConditionWatcher
+## A ConditionWatcher watches the buy/sell condition config files in the background
+## and re-validates them whenever they change, so they can be swapped into the
+## running auto-trader without restarting it.
+##
+## directory - The directory containing the buy/sell condition config files
+## poll_time - The time in seconds between checking the config files
+## price_decimals - The number of decimal places in one tick of the price
+## specs - The last valid condition specs of each mode
+## max_intervals - The max interval of the current conditions of each mode
+## errors - The last error of each mode (so an invalid file is only reported once)
+## update - The (buy_conditions, sell_conditions, max_interval_length) waiting to be swapped in,
+##          where an unchanged mode is None
+class ConditionWatcher:
+    def __init__(self, buy_conditions, sell_conditions, directory='TradeConditions', poll_time=1, price_decimals=2):
+        self.directory = directory
+        self.poll_time = poll_time
+        self.price_decimals = price_decimals
+        self.specs = {}
+        for mode in ('buy', 'sell'):
+            self.specs[mode] = load_condition_specs(mode, directory+'/'+mode+'-conditions.conf')
+        self.max_intervals = {'buy': max_interval(buy_conditions), 'sell': max_interval(sell_conditions)}
+        self.errors = {'buy': None, 'sell': None}
+        self.update = None
+        self.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.watch, daemon=True)
+
+    ##
+    ## Start watching the config files
+    ##
+    def start(self):
+        self.thread.start()
+
+    ##
+    ## Checks the config files forever. Unchanged files are answered by the
+    ## cache in load_condition_specs, so each check is only a stat per file.
+    ##
+    def watch(self):
+        while True:
+            sleep(self.poll_time)
+            for mode in ('buy', 'sell'):
+                self.check(mode)
+
+    ##
+    ## Re-validate the config file of a mode and queue the new conditions if it changed
+    ##
+    ## @param mode
+    ##      Either "buy" or "sell"
+    ##
+    def check(self, mode):
+        try:
+            specs = load_condition_specs(mode, self.directory+'/'+mode+'-conditions.conf')
+            if specs is self.specs[mode]:
+                self.errors[mode] = None
+                return
+
+            # Everything the tick loop needs is prepared here, so the swap is only an assignment
+            conditions = build_trade_conditions(specs, self.price_decimals)
+            reset_run(conditions)
+
+        # Any error keeps the current conditions (and the watcher running) until the file is fixed
+        except Exception as error:
+            if str(error) != self.errors[mode]:
+                self.errors[mode] = str(error)
+                print('ERROR: ' + str(error))
+                print('       Keeping the current '+mode+' conditions')
+            return
+        self.errors[mode] = None
+        self.specs[mode] = specs
+        self.max_intervals[mode] = max_interval(conditions)
+        max_interval_length = max(self.max_intervals['buy'], self.max_intervals['sell'])
+
+        with self.lock:
+            buy_conditions = None
+            sell_conditions = None
+            if self.update is not None:
+                buy_conditions, sell_conditions, _ = self.update
+            if mode == 'buy':
+                buy_conditions = conditions
+            else:
+                sell_conditions = conditions
+            self.update = (buy_conditions, sell_conditions, max_interval_length)
+        print('RELOADED '+mode.upper()+' CONDITIONS')
+
+    ##
+    ## Take the conditions waiting to be swapped in
+    ##
+    ## @return
+    ##      (buy_conditions, sell_conditions, max_interval_length), where an unchanged
+    ##      mode is None, or None if nothing changed
+    ##
+    def take_update(self):
+        if self.update is None:
+            return None
+        with self.lock:
+            update = self.update
+            self.update = None
+        return update
@@ -1,20 +1,206 @@
 ##
 ## exchange.py
 ## This file contains all relevant information regarding the use of Exchange.
-## This includes the class Exchange itself, the Exchange functions, and a 
-## function generate_exchage which generates the Exchange.
+## This includes the class Exchange itself, the Exchange functions, the class
+## RequestScheduler which keeps every request under the exchange's rate limit, the
+## registry of exchange backends, and a function generate_exchage which generates the Exchange.
 ##
 
+import ctypes
+import importlib
 from time import sleep
-import robin_stocks.robinhood as r
-import cbpro
-import requests
+import threading
+import time
+import fixed_point
 
-# All of the current available exchanges for use
-exchanges = ['Coinbase Pro', 'Robinhood']
+# All of the current available exchanges for use.
+# Each exchange is an Exchange subclass, given as 'module:class'. The module (and the
+# exchange's SDK) is only imported once the exchange is chosen, so sandbox runs,
+# backtests and the benchmarks don't need every SDK installed.
+exchanges = {
+    'Coinbase Pro': 'backends.coinbase_pro:CoinbasePro',
+    'Robinhood': 'backends.robinhood:Robinhood'
+}
+
+##
+## Add an exchange backend
+##
+## @param name
+##      The name of the exchange
+##
+## @param backend
+##      The Exchange subclass of the exchange, as 'module:class'
+##
+def register_exchange(name, backend):
+    exchanges[name] = backend
+
+##
+## Import the Exchange subclass of an exchange
+##
+## @param name
+##      The name of the exchange
+##
+## @return
+##      The Exchange subclass
+##
+def load_exchange(name):
+    module_name, _, class_name = exchanges[name].partition(':')
+    return getattr(importlib.import_module(module_name), class_name)
+
+## SchedulerState
+## The state of a RequestScheduler, kept in one ctypes structure so it can be
+## moved into shared memory (see RequestScheduler.share)
+##
+## tokens - The current number of tokens
+## last_refill - The time the tokens were last refilled
+## backoff - The current time in seconds to back off after being throttled (0 if not throttled)
+## backoff_until - The time that requests can start again after being throttled
+## order_requests - The number of requests made for orders
+## poll_requests - The number of requests made for price polling
+## waits - The number of times a request had to wait for a token
+## wait_time - The total time in seconds spent waiting for tokens
+## throttles - The number of times the exchange throttled a request
+class SchedulerState(ctypes.Structure):
+    _fields_ = [
+        ('tokens', ctypes.c_double),
+        ('last_refill', ctypes.c_double),
+        ('backoff', ctypes.c_double),
+        ('backoff_until', ctypes.c_double),
+        ('order_requests', ctypes.c_long),
+        ('poll_requests', ctypes.c_long),
+        ('waits', ctypes.c_long),
+        ('wait_time', ctypes.c_double),
+        ('throttles', ctypes.c_long)
+    ]
+
+## RequestScheduler
+## A RequestScheduler is a token bucket shared by every request made to an exchange.
+## Order requests (buying, selling, checking orders and balances) can use every token,
+## while price polling leaves some tokens in reserve so an order never waits on it.
+##
+## rate - The number of tokens added per second
+## capacity - The max number of tokens (the burst size)
+## reserve - The number of tokens price polling can't use
+## state - The SchedulerState of the bucket
+## lock - The lock of the state
+class RequestScheduler:
+
+    def __init__(self, _rate, _capacity, _reserve):
+        self.rate = _rate
+        self.capacity = _capacity
+        self.reserve = _reserve
+        self.state = SchedulerState(tokens=_capacity, last_refill=time.monotonic())
+        self.lock = threading.Lock()
+
+    ##
+    ## Move the bucket into shared memory, so every process forked after this
+    ## (see cluster.py) takes its tokens from the same bucket
+    ##
+    ## @param context
+    ##      The multiprocessing context the processes are started with
+    ##
+    def share(self, context):
+        with self.lock:
+            self.state = context.RawValue(SchedulerState, *(getattr(self.state, field) for field, _ in SchedulerState._fields_))
+        self.lock = context.Lock()
+
+    ##
+    ## Add the tokens earned since the last refill
+    ##
+    def refill(self):
+        now = time.monotonic()
+        self.state.tokens = min(self.capacity, self.state.tokens + (now-self.state.last_refill)*self.rate)
+        self.state.last_refill = now
+
+    ##
+    ## Wait until a request can be made and take its token
+    ##
+    ## @param priority
+    ##      'order' for the requests of a trade, 'poll' for price polling
+    ##
+    def acquire(self, priority='order'):
+        floor = 0 if priority == 'order' else self.reserve
+        while True:
+            with self.lock:
+                self.refill()
+                wait = max(self.state.backoff_until - time.monotonic(), (floor + 1 - self.state.tokens)/self.rate)
+                if wait <= 0:
+                    self.state.tokens -= 1
+                    if priority == 'order':
+                        self.state.order_requests += 1
+                    else:
+                        self.state.poll_requests += 1
+                    return
+                self.state.waits += 1
+                self.state.wait_time += wait
+            sleep(wait)
+
+    ##
+    ## Get the time to wait before polling the price again, stretching the
+    ## normal wait so polling never eats into the tokens kept for orders
+    ##
+    ## @param sleep_time
+    ##      The normal time in seconds between polling the price
+    ##
+    ## @return
+    ##      The time in seconds to wait
+    ##
+    def poll_delay(self, sleep_time):
+        with self.lock:
+            self.refill()
+            wait = max(sleep_time, (self.reserve + 1 - self.state.tokens)/self.rate)
+            return max(wait, self.state.backoff_until - time.monotonic())
+
+    ##
+    ## Record that the exchange throttled a request. The bucket is emptied and
+    ## every request backs off, doubling the back off each time in a row.
+    ##
+    def throttled(self):
+        with self.lock:
+            self.state.throttles += 1
+            self.state.tokens = 0
+            self.state.backoff = min(max(self.state.backoff*2, 1/self.rate), 30)
+            self.state.backoff_until = time.monotonic() + self.state.backoff
+
+    ##
+    ## Record that a request went through, ending any back off
+    ##
+    def succeeded(self):
+        self.state.backoff = 0
+
+    ##
+    ## Describe the throttle metrics
+    ##
+    ## @return
+    ##      The metrics as one line of text
+    ##
+    def summary(self):
+        metrics = self.metrics()
+        return 'Requests: '+str(metrics['order_requests'])+' for orders, '+str(metrics['poll_requests'])+' for prices, '+str(metrics['waits'])+' waits ('+'%.1f' % metrics['wait_time']+' seconds), '+str(metrics['throttles'])+' throttled'
+
+    ##
+    ## Get the throttle metrics
+    ##
+    ## @return
+    ##      A dictionary of the metrics
+    ##
+    def metrics(self):
+        with self.lock:
+            self.refill()
+            return {
+                'order_requests': self.state.order_requests,
+                'poll_requests': self.state.poll_requests,
+                'tokens': self.state.tokens,
+                'waits': self.state.waits,
+                'wait_time': self.state.wait_time,
+                'throttles': self.state.throttles,
+                'backoff': self.state.backoff
+            }
 
 ## Exchange
-## An Exchange object represents a crypto exchange and a user's wallet in it
+## An Exchange object represents a crypto exchange and a user's wallet in it.
+## Each exchange subclasses it (see the backends package), implementing login,
+## market_buy, market_sell and get_price, and prompt_credentials if it needs any.
 ##
 ## exchange_name - The name of the exchange
 ## coin - The name of the coin that is being traded
@@ -23,10 +209,19 @@ exchanges = ['Coinbase Pro', 'Robinhood']
 ## api_key - The api key of the user (not always necessary depending on the exchange)
 ## api_secret - The secret api key of the user (not always necessary depending on the exchange)
 ## sandbox - True if using snadbox mode, otherwise False
-## balance - The USD balance in the user's wallet
-## crypto_balance - The amount of the coin the user owns
+## price_decimals - The number of decimal places in the exchange's price increment (one tick)
+## size_decimals - The number of decimal places in the exchange's order size increment
+## size_step - The order size increment, in units of size_decimals
+## balance - The USD balance in the user's wallet, in ticks
+## crypto_balance - The amount of the coin the user owns, in units of size_decimals
+## scheduler - The RequestScheduler every request to the exchange goes through
+## status_code - The HTTP status of the last response (see watch_session)
 class Exchange:
 
+    # The request limit of the exchange:
+    # (requests per second, burst size, requests kept in reserve for orders)
+    rate_limit = (1, 1, 0)
+
     def __init__(self, _exchange_name, _coin, _username, _passphrase, _api_key, _api_secret, _sandbox):
         self.exchange_name = _exchange_name
         self.coin = _coin
@@ -36,93 +231,167 @@ class Exchange:
         self.api_secret = _api_secret
         self.sandbox = _sandbox
         self.crypto_balance = 0
+        self.status_code = None
 
-        # Check for valid exchange_name
-        exchange_present = False
-        for i in exchanges:
-            if self.exchange_name == i:
-                exchange_present = True
-                break
-        if not exchange_present:
-            print('ERROR: \"' + self.exchange_name + '\" is not a valid exchange name.')
-            quit()
+        self.scheduler = RequestScheduler(*self.rate_limit)
 
-        # Login to the specified exchange
-        if self.exchange_name == 'Coinbase Pro':
-            self.client = cbpro.AuthenticatedClient(self.api_key, self.api_secret, self.passphrase)
-            self.account_id = input('What\'s your account ID (ex: 7d0f7d8e-dd34-4d9c-a846-06f431c381ba)?: ')
-            self.balance =  self.client.get_account(self.account_id)['available']
-
-            self.public_client = cbpro.PublicClient()
-        if self.exchange_name == 'Robinhood':
-            try:
-                login = r.login(username=self.username, password=self.passphrase, store_session=False)
-            except:
-                print('Cannot login with the provided credentials.')
-                quit()
-            self.balance = r.load_account_profile()['portfolio_cash']
+        # Login to the exchange, which also gets the increments and the balance
+        self.login()
         
         # If sandbox is specified, provide how much funding to start with
         if self.sandbox:
-            self.balance = float(input('How much funding would you like to start with for this sandbox? '))
+            self.balance = fixed_point.to_ticks(input('How much funding would you like to start with for this sandbox? '), self.price_decimals)
+
+    ##
+    ## Ask the user for the credentials the exchange needs to login
+    ##
+    ## @return
+    ##      (username, passphrase, api_key, api_secret), with '' for any that aren't needed
+    ##
+    @classmethod
+    def prompt_credentials(cls):
+        return '', '', '', ''
 
     ##
-    ## Buy the specified crypto with the amount of money in balance
+    ## Login to the exchange and set price_decimals, size_decimals, size_step and balance
+    ##
+    def login(self):
+        raise NotImplementedError
+
+    ##
+    ## Record the HTTP status of every response of a requests session, so a
+    ## throttled request (HTTP 429) is recognized whatever the exchange client
+    ## returns for it
+    ##
+    ## @param session
+    ##      The requests session of an exchange client
+    ##
+    def watch_session(self, session):
+        session.hooks['response'].append(self.record_status)
+
+    ##
+    ## Record the HTTP status of a response (a requests response hook)
+    ##
+    ## @param response
+    ##      The response of the exchange
+    ##
+    def record_status(self, response, *args, **kwargs):
+        self.status_code = response.status_code
+
+    ##
+    ## Make a request to the exchange through the scheduler, waiting out the
+    ## exchange's rate limit and retrying if the request gets throttled (HTTP 429,
+    ## which the exchange rejects without acting on). Any other response is returned.
+    ##
+    ## @param priority
+    ##      'order' for the requests of a trade, 'poll' for price polling
+    ##
+    ## @param function
+    ##      The exchange client function that makes the request
+    ##
+    ## @return
+    ##      The response of the exchange
+    ##
+    def request(self, priority, function, *args, **kwargs):
+        while True:
+            self.scheduler.acquire(priority)
+            self.status_code = None
+            response = function(*args, **kwargs)
+            if self.status_code != 429:
+                self.scheduler.succeeded()
+                return response
+            self.scheduler.throttled()
+            print('RATE LIMITED by ' + self.exchange_name + ', backing off ' + str(self.scheduler.state.backoff) + ' seconds')
+
+    ##
+    ## Place an order through the scheduler. A throttled order (HTTP 429) was
+    ## rejected, so it is sent again after backing off like request does. Any other
+    ## failed request (such as a timeout) may still have placed the order, so it is
+    ## never sent again and anything but a placed order stops the auto-trader.
+    ##
+    ## @param side
+    ##      'Buy' or 'Sell', for the error message
+    ##
+    ## @param function
+    ##      The exchange client function that places the order
+    ##
+    ## @return
+    ##      The order placed
+    ##
+    def place_order(self, side, function, *args, **kwargs):
+        order = self.request('order', function, *args, **kwargs)
+        if not isinstance(order, dict) or 'id' not in order:
+            print('ERROR: ' + side + ' order failed: ' + str(order))
+            print('       Check the account on ' + self.exchange_name + ', the order may still have gone through')
+            quit()
+        return order
+
+    ##
+    ## Round an amount of the coin down to the exchange's order size increment
+    ##
+    ## @param size
+    ##      The amount of the coin, in units of size_decimals
+    ##
+    ## @return
+    ##      The amount rounded down
+    ##
+    def round_size(self, size):
+        return size - size % self.size_step
+
+    ##
+    ## Buy the specified crypto with the amount of money in balance.
+    ## balance and crypto_balance only change by the amounts traded, so several
+    ## traders can share one account (see cluster.py).
     ##
     def buy(self):
+        ask = self.get_price(price_mode='ask', priority='order')
 
-        # If sandbox, set the crypto balance to the current crypto balance / the bid price of one coin
-        # and set the balance to 0
+        # If the balance can't buy one order size increment (such as a second buy
+        # on the same price), there is nothing to buy
+        if self.balance*10**self.size_decimals < self.size_step*ask:
+            return
+
+        # If sandbox, add as much of the coin as the balance can buy at the ask price
+        # to the crypto balance, and take what it cost from the balance
         if self.sandbox:
-            self.crypto_balance = self.balance/self.get_price(price_mode='ask')
-            self.balance = 0
+            bought = self.round_size(self.balance*10**self.size_decimals//ask)
+            self.crypto_balance += bought
+            self.balance -= -(-bought*ask//10**self.size_decimals)
             return
-    
-        # Use Coinbase Pro to buy
-        if self.exchange_name == 'Coinbase Pro':
-            order = self.client.buy(product_id=self.coin+'-USD', order_type='market', funds=self.balance)
-            while self.client.get_order(order['id'])['status'] != 'pending':
-                sleep(0.2)
-            if self.client.get_order(order['id'])['status'] == 'canceled':
-                print('ERROR: Buy order canceled')
-                quit()
-            self.crypto_balance = self.client.get_order(order['id'])['size']
-        
-        # Use Robinhood to buy
-        if self.exchange_name == 'Robinhood':
-            r.order_buy_crypto_by_price(self.coin, self.balance)
-            coin_placement = 0
-            for coin_placement in self.crypto_balance:
-                if coin_placement['currency']['code'] == self.coin:
-                    break
-            self.crypto_balance = float(coin_placement['quantity'])
+
+        self.market_buy()
 
     ##
-    ## Sell the specified crypto with the amount of crypto in crypto_balance
+    ## Sell the specified crypto with the amount of crypto in crypto_balance.
+    ## balance and crypto_balance only change by the amounts traded, so several
+    ## traders can share one account (see cluster.py).
     ##
     def sell(self):
-        
-        # If sandbox, set the balance to the bid price of one coin * the current crypto balance
+
+        # If there is less than one order size increment of the coin, there is nothing to sell
+        if self.crypto_balance < self.size_step:
+            return
+
+        # If sandbox, add the bid price of one coin * the current crypto balance to the balance
         # and set the crypto balance to 0
         if self.sandbox:
-            self.balance = self.get_price(price_mode='bid')*self.crypto_balance
+            self.balance += self.get_price(price_mode='bid', priority='order')*self.crypto_balance//10**self.size_decimals
             self.crypto_balance = 0
             return
 
-        # Use Coinbase Pro to sell
-        if self.exchange_name == 'Coinbase Pro':
-            order = self.client.sell(product_id=self.coin+'-USD', order_type='market', size=self.crypto_balance)
-            while self.client.get_order(order['id'])['status'] != 'pending':
-                sleep(0.2)
-            if self.client.get_order(order['id'])['status'] == 'canceled':
-                print('ERROR: Sell order canceled')
-                quit()
-            self.balance =  self.client.get_account(self.account_id)['available']
-        
-        # Use Robinhood to sell
-        if self.exchange_name == 'Robinhood':
-            r.order_sell_crypto_by_quantity(self.coin, self.crypto_balance)
-            self.balance = r.load_account_profile()['portfolio_cash']
+        self.market_sell()
+
+    ##
+    ## Buy the coin on the exchange with all of balance, updating balance and crypto_balance
+    ##
+    def market_buy(self):
+        raise NotImplementedError
+
+    ##
+    ## Sell all of crypto_balance on the exchange, updating balance and crypto_balance
+    ##
+    def market_sell(self):
+        raise NotImplementedError
 
     ##
     ## Get the price of one coin
@@ -130,26 +399,22 @@ class Exchange:
     ## @param price_mode
     ##      Specifies if the funcition will return the bid price, ask price, or the mark price
     ##
+    ## @param priority
+    ##      'poll' when polling the price, 'order' when the price is part of a trade
+    ##
     ## @return
-    ##      The current price of the coin
+    ##      The current price of the coin, in ticks
     ##
-    def get_price(self, price_mode='None'):
+    def get_price(self, price_mode='None', priority='poll'):
+        raise NotImplementedError
 
-        # Use Coinbase Pro to get the price
-        if self.exchange_name == 'Coinbase Pro':
-            if self.sandbox:
-                if price_mode == 'bid':
-                    return float(self.public_client.get_product_ticker(self.coin+'-USD')['bid'])
-                return float(self.public_client.get_product_ticker(self.coin+'-USD')['ask'])
-            return float(self.public_client.get_product_ticker(self.coin+'-USD')['price'])
-        
-        # Use Robinhood to get the price
-        if self.exchange_name == 'Robinhood':
-            if self.sandbox:
-                if price_mode == 'bid':
-                    return float(r.get_crypto_quote(self.coin)['bid_price'])
-                return float(r.get_crypto_quote(self.coin)['ask_price'])
-            return float(r.get_crypto_quote(self.coin)['mark_price'])
+    ##
+    ## Drop the connections the exchange clients keep open. A process forked from
+    ## this one (see cluster.py) calls this first, so it doesn't share sockets with
+    ## the other processes; the logged in sessions themselves are kept.
+    ##
+    def reset_connections(self):
+        pass
 
         
 ##
@@ -159,22 +424,19 @@ class Exchange:
 ##      The exchange generated
 ##
 def generate_exchange():
-    exchange = input('What exchange are you using (Coinbase Pro, Robinhood)? ')
+    exchange = input('What exchange are you using (' + ', '.join(exchanges) + ')? ')
+
+    # Check for valid exchange name
+    if exchange not in exchanges:
+        print('ERROR: \"' + exchange + '\" is not a valid exchange name.')
+        quit()
+    exchange_class = load_exchange(exchange)
+
     coin = input('What coin would you like to be trading (Use the shorthand name such as BTC, ETH, SOL)? ')
-    username = ''
-    passphrase = ''
-    api_key = ''
-    api_secret = ''
-
-
-    if exchange == 'Coinbase Pro':
-        passphrase = input('What is your passphrase? ')
-        api_key = input('What is your API key? ')
-        api_secret = input('What is your API secret key? ')
-    if exchange == 'Robinhood':
-        username = input('What is your email? ')
-        passphrase = input('What is your password? ')
-    
+
+    # Each exchange asks for the credentials it needs
+    username, passphrase, api_key, api_secret = exchange_class.prompt_credentials()
+
     # Sandbox
     _sandbox = input('Would you like to run this is sandbox mode (Y/N)? ')
     sandbox = False
@@ -184,5 +446,5 @@ def generate_exchange():
         print('Invalid sandbox response ')
         quit()
 
-    return Exchange(exchange, coin, username, passphrase, api_key, api_secret, sandbox)
+    return exchange_class(exchange, coin, username, passphrase, api_key, api_secret, sandbox)
 
@@ -0,0 +1,93 @@
+##
+## fixed_point.py
+## This file contains the conversions between decimal amounts and the integer
+## amounts used everywhere else.
+##
+## Prices and USD balances are counted in ticks of the exchange's price increment
+## (10^-price_decimals USD, so cents for most coins) and coin balances in units of
+## 10^-size_decimals coins. This keeps every comparison and balance update in
+## integer math, with amounts that are always valid for the exchange.
+##
+
+from decimal import Decimal
+import math
+
+##
+## Parse a decimal amount into ticks, dropping any digits past a tick.
+## Exchanges send amounts as strings, so this is done on the digits directly
+## instead of going through float.
+##
+## @param value
+##      The amount as a str or bytes (such as "43210.57" or b"43210.57")
+##
+## @param decimals
+##      The number of decimal places in one tick
+##
+## @return
+##      The amount in ticks
+##
+def to_ticks(value, decimals):
+    value = value.strip()
+    if isinstance(value, bytes):
+        point, zero, minus = b'.', b'0', b'-'
+    else:
+        point, zero, minus = '.', '0', '-'
+
+        # Exponents (such as "1e3") only come from the user, so go through Decimal
+        if 'e' in value or 'E' in value:
+            return math.floor(Decimal(value).scaleb(decimals))
+
+    if value.startswith(minus):
+        return -to_ticks(value[1:], decimals)
+    whole, _, fraction = value.partition(point)
+    return int(whole or zero)*10**decimals + int(fraction[:decimals].ljust(decimals, zero) or zero)
+
+##
+## Convert a number from a config file into ticks, rounding up.
+## Rounding up keeps comparisons the same, as prices are always whole ticks:
+## (price >= min + 2.505) is (price >= min + 251) when in cents.
+##
+## @param value
+##      The amount as a number or str
+##
+## @param decimals
+##      The number of decimal places in one tick
+##
+## @return
+##      The amount in ticks
+##
+def to_ticks_ceil(value, decimals):
+    return math.ceil(Decimal(repr(value) if isinstance(value, float) else value).scaleb(decimals))
+
+##
+## Format ticks as a decimal amount
+##
+## @param ticks
+##      The amount in ticks
+##
+## @param decimals
+##      The number of decimal places in one tick
+##
+## @return
+##      The amount as a str (such as "43210.57")
+##
+def from_ticks(ticks, decimals):
+    if decimals == 0:
+        return str(ticks)
+    sign = '-' if ticks < 0 else ''
+    whole, fraction = divmod(abs(ticks), 10**decimals)
+    return sign + str(whole) + '.' + str(fraction).rjust(decimals, '0')
+
+##
+## Get the number of decimal places and the size of an exchange increment
+##
+## @param increment
+##      The increment as a str (such as "0.01000000" or "0.05")
+##
+## @return
+##      (decimals, the increment in ticks of that many decimals)
+##
+def increment_decimals(increment):
+    increment = Decimal(increment).normalize()
+    decimals = max(0, -increment.as_tuple().exponent)
+    return decimals, int(increment.scaleb(decimals))
@@ -0,0 +1,421 @@
+##
+## trader.py
+## This file contains the algorithmic trading methodology of the auto-trader.
+## This includes the class AutoTrader, which runs the buy/sell TradeConditions
+## over every new price of the coin and trades through an Exchange.
+##
+## AutoTrader doesn't get the prices itself, so the same trading decisions are
+## made whether the prices come from a live exchange (auto-trader.py) or from
+## recorded ticks (benchmarks/replay.py).
+##
+## Every price is an integer number of ticks (see fixed_point.py), so the
+## trading conditions are checked with integer math only.
+##
+## The function main runs the live auto-trader (started by auto-trader.py).
+##
+
+from time import sleep
+import time
+import condition
+import exchange
+import fixed_point
+
+# The time in seconds between price retrievals
+sleep_time = 0.2
+
+##
+## Disables the current condition and enables the next condition on the branch
+##
+## @param _condition
+##      The current condition that needs to not be run anymore
+##
+def next_link(_condition):
+    print("NEXT LINK from condition " + _condition.condition_id + " to condition " + _condition.next_link.condition_id)
+    _condition.run = False
+    _condition.next_link.run = True
+
+
+## AutoTrader
+## An AutoTrader holds the state of the auto-trader between prices.
+##
+## crypto_exchange - The Exchange (or anything with buy(), sell() and price_decimals) to trade through
+## buy_conditions - The buy TradeConditions
+## sell_conditions - The sell TradeConditions
+## sell_floor - The price (in ticks) that sells everything and stops trading
+## prices_interval - Pairs of price (in ticks) and time within the max interval
+## mode - 0 if buying, 1 if selling
+## reset - Changes to True after every trade, meaning start_after_trade() needs to be called
+## max_interval_length - The longest interval of all of the conditions
+## max_price_since_trade - The max price since the last trade
+## min_price_since_trade - The min price since the last trade
+class AutoTrader:
+    def __init__(self, _crypto_exchange, _buy_conditions, _sell_conditions, _sell_floor, price):
+        self.crypto_exchange = _crypto_exchange
+        self.buy_conditions = _buy_conditions
+        self.sell_conditions = _sell_conditions
+        self.sell_floor = _sell_floor
+        self.prices_interval = []
+        self.mode = 0
+        self.reset = True
+        self.max_interval_length = max(condition.max_interval(_buy_conditions), condition.max_interval(_sell_conditions))
+        self.max_price_since_trade = price
+        self.min_price_since_trade = price
+
+    ##
+    ## Reset the key variables after a trade is executed
+    ##
+    ## @param price
+    ##      The current price of the coin in ticks
+    ##
+    def start_after_trade(self, price):
+
+        # Ensure this only runs right after a trade is executed
+        self.reset = False
+
+        # Clear the list of prices in the interval
+        self.prices_interval.clear()
+
+        # Reset max_price_since_trade and min_price_since_trade
+        self.max_price_since_trade = price
+        self.min_price_since_trade = price
+
+        # Reset the availability of the buy conditions
+        condition.reset_run(self.buy_conditions)
+
+        # Reset the availability of the sell conditions
+        condition.reset_run(self.sell_conditions)
+
+    ##
+    ## Swap in reloaded buy/sell conditions. The price history, the prices since
+    ## the last trade and the mode are kept; the new conditions start from the
+    ## beginning of their branches.
+    ##
+    ## @param update
+    ##      (buy_conditions, sell_conditions, max_interval_length) from a ConditionWatcher,
+    ##      where an unchanged mode is None
+    ##
+    def swap_conditions(self, update):
+        if update[0] is not None:
+            self.buy_conditions = update[0]
+        if update[1] is not None:
+            self.sell_conditions = update[1]
+        self.max_interval_length = update[2]
+
+    ##
+    ## Run the buy/sell conditions on a new price, trading if one passes
+    ##
+    ## @param crypto_price
+    ##      The current price of the coin in ticks
+    ##
+    ## @param current_time
+    ##      The time of the price in seconds
+    ##
+    ## @return
+    ##      False if the price went below the sell floor and trading has to stop, otherwise True
+    ##
+    def tick(self, crypto_price, current_time):
+
+        # Link the price and time of the coin and append it to the interval prices list
+        self.prices_interval.append((crypto_price, current_time))
+
+        # Remove the prices with a time that are greater than maximum interval seconds ago
+        for i in self.prices_interval:
+            if current_time - i[1] > self.max_interval_length:
+                self.prices_interval.pop(0)
+            else:
+                break
+    
+        # If the current price is greater than the max price since the last trade
+        if crypto_price > self.max_price_since_trade:
+            self.max_price_since_trade = crypto_price
+
+        # If the current price is less than the min price since the last trade
+        if crypto_price < self.min_price_since_trade:
+            self.min_price_since_trade = crypto_price
+
+        # If the price is less than the sell floor, sell everything and stop trading
+        if crypto_price < self.sell_floor:
+            print("PRICE IS BELOW THE SELL FLOOR")
+            if self.mode == 1:
+                self.crypto_exchange.sell()
+            return False
+
+        #
+        # BUY MODE
+        #
+        if self.mode == 0:
+
+            # Loop through every buy condition
+            for i in self.buy_conditions:
+            
+                # If the current buy condition isn't valid, move on to the next one
+                if not i.run:
+                    continue
+            
+                # Get the max and min prices in the interval of the buy condition
+                max_interval_price = crypto_price
+                min_interval_price = crypto_price
+                for p in reversed(self.prices_interval):
+                    if current_time - p[1] > i.interval:
+                        break
+                    if p[0] > max_interval_price:
+                        max_interval_price = p[0]
+                    elif p[0] < min_interval_price:
+                        min_interval_price = p[0]
+            
+                # If the buy condition used PERCENT_UP
+                if i.percent_up > 1:
+
+                    # If the condition uses INTERVAL_PRICE
+                    if i.from_up == 0:
+
+                        # If the current price >= minimum price in the interval * the percent up, BUY
+                        if crypto_price*i.up_den >= min_interval_price*i.up_num:
+                            print("BOUGHT AT "+fixed_point.from_ticks(crypto_price, self.crypto_exchange.price_decimals))
+                            self.mode = 1
+                            self.reset = True
+                            self.crypto_exchange.buy()
+                
+                    # If the condition uses TRADE_PRICE
+                    else:
+
+                        # If the current price >= minimum price since the last trade * the percent up, BUY
+                        if crypto_price*i.up_den >= self.min_price_since_trade*i.up_num:
+                            print("BOUGHT AT "+fixed_point.from_ticks(crypto_price, self.crypto_exchange.price_decimals))
+                            self.mode = 1
+                            self.reset = True
+                            self.crypto_exchange.buy()
+
+                # If the buy condition used PRICE_UP
+                else:
+
+                    # If the condition uses INTERVAL_PRICE
+                    if i.from_up == 0:
+
+                        # If the current price >= minimum price in the interval + the price up, BUY
+                        if crypto_price >= min_interval_price + i.price_up_ticks:
+                            print("BOUGHT AT "+fixed_point.from_ticks(crypto_price, self.crypto_exchange.price_decimals))
+                            self.mode = 1
+                            self.reset = True
+                            self.crypto_exchange.buy()
+
+                    # If the condition uses TRADE_PRICE
+                    else:
+
+                        # If the current price >= minimum price since the last trade + the price up, BUY
+                        if crypto_price >= self.min_price_since_trade + i.price_up_ticks:
+                            print("BOUGHT AT "+fixed_point.from_ticks(crypto_price, self.crypto_exchange.price_decimals))
+                            self.mode = 1
+                            self.reset = True
+                            self.crypto_exchange.buy()
+            
+                # If there is no next link, continue to the next buy condition
+                if type(i.next_link).__name__ != 'TradeCondition':
+                    continue
+
+                # If the buy condition uses PERCENT_DOWN
+                if i.percent_down < 1:
+
+                    # If the condition uses INTERVAL_PRICE
+                    if i.from_down == 0:
+
+                        # If the current price <= maximum price in the interval * the percent down, NEXT LINK
+                        if crypto_price*i.down_den <= max_interval_price*i.down_num:
+                            next_link(i)
+                
+                    # If the condition uses TRADE_PRICE
+                    else:
+
+                        # If the current price <= maximum price since the last trade * the percent down, NEXT LINK
+                        if crypto_price*i.down_den <= self.max_price_since_trade*i.down_num:
+                            next_link(i)
+            
+                # If the buy condition uses PRICE_DOWN
+                else:
+
+                    # If the buy condition uses INTERVAL_PRICE
+                    if i.from_down == 0:
+
+                        # If the difference of the maximum price in the interval and the current price >= the price down, NEXT LINK
+                        if (max_interval_price-crypto_price) >= i.price_down_ticks:
+                            next_link(i)
+                
+                    # If the buy condition uses TRADE_PRICE
+                    else:
+
+                        # If the difference of the maximum price since the last trade and the current price >= the price down, NEXT LINK
+                        if (self.max_price_since_trade-crypto_price) >= i.price_down_ticks:
+                            next_link(i)
+
+        #
+        # SELL MODE
+        #                  
+        else:
+
+            # Loop through every sell condition
+            for i in self.sell_conditions:
+
+                # If the current sell condition isn't valid, move on to the next one
+                if not i.run:
+                    continue
+
+                # Get the max and min prices in the interval of the sell condition
+                max_interval_price = crypto_price
+                min_interval_price = crypto_price
+                for p in reversed(self.prices_interval):
+                    if current_time - p[1] > i.interval:
+                        break
+                    if p[0] > max_interval_price:
+                        max_interval_price = p[0]
+                    elif p[0] < min_interval_price:
+                        min_interval_price = p[0]
+            
+                # If the sell condition uses PERCENT_DOWN
+                if i.percent_down < 1:
+
+                    # If the condition uses INTERVAL_PRICE
+                    if i.from_down == 0:
+
+                        # If the current price <= maximum price in the interval * the percent down, SELL
+                        if crypto_price*i.down_den <= max_interval_price*i.down_num:
+                            print("SOLD AT "+fixed_point.from_ticks(crypto_price, self.crypto_exchange.price_decimals))
+                            self.mode = 0
+                            self.reset = True
+                            self.crypto_exchange.sell()
+                
+                    # If the condition uses TRADE_PRICE
+                    else:
+
+                        # If the current price <= maximum price since the last trade * the percent down, SELL
+                        if crypto_price*i.down_den <= self.max_price_since_trade*i.down_num:
+                            print("SOLD AT "+fixed_point.from_ticks(crypto_price, self.crypto_exchange.price_decimals))
+                            self.mode = 0
+                            self.reset = True
+                            self.crypto_exchange.sell()
+            
+                # If the sell condition uses PRICE_DOWN
+                else:
+
+                    # If the condition uses INTERVAL_PRICE 
+                    if i.from_down == 0:
+
+                        # If the difference of the maximum price in the interval and the current price >= the price down, SELL
+                        if (max_interval_price-crypto_price) >= i.price_down_ticks:
+                            print("SOLD AT "+fixed_point.from_ticks(crypto_price, self.crypto_exchange.price_decimals))
+                            self.mode = 0
+                            self.reset = True
+                            self.crypto_exchange.sell()
+                
+                    # If the condition uses TRADE_PRICE
+                    else:
+
+                        # If the difference of the maximum price since the last trade and the current price >= the price down, SELL
+                        if (self.max_price_since_trade-crypto_price) >= i.price_down_ticks:
+                            print("SOLD AT "+str(i.price_down))
+                            self.mode = 0
+                            self.reset = True
+                            self.crypto_exchange.sell()
+
+                # If there is no next link, continue to the next sell condition
+                if type(i.next_link).__name__ != 'TradeCondition':
+                    continue
+            
+                # If the sell condition uses PERCENT_UP
+                if i.percent_up > 1:
+
+                    # If the condition uses INTERVAL_PRICE
+                    if i.from_up == 0:
+
+                        # If the current price >= minimum price in the interval * the percent up, NEXT LINK
+                        if crypto_price*i.up_den >= min_interval_price*i.up_num:
+                            next_link(i)
+                
+                    # If the condition uses TRADE_PRICE
+                    else:
+
+                        # If the current price >= minimum price since the last trade + the percent up, NEXT LINK
+                        if crypto_price*i.up_den >= self.min_price_since_trade*i.up_num:
+                            next_link(i)
+            
+                # If the sell condition uses PRICE_UP
+                else:
+
+                    # If the condition uses INTERVAL_PRICE
+                    if i.from_up == 0:
+
+                        # If the current price >= minimum price in the interval + the price up, NEXT LINK
+                        if crypto_price >= min_interval_price + i.price_up_ticks:
+                            next_link(i)
+                
+                    # If the condition uses TRADE_PRICE
+                    else:
+
+                        # If the current price >= minimum price since the last trade + the price up, NEXT LINK
+                        if crypto_price >= self.min_price_since_trade + i.price_up_ticks:
+                            next_link(i)
+
+        return True
+
+
+##
+## Run the auto-trader: ask for the exchange and the sell floor, then trade
+## until the price goes below the sell floor
+##
+def main():
+
+    # Generate the crypto exchange
+    crypto_exchange = exchange.generate_exchange()
+
+    # The buy conditions
+    buy_conditions = condition.generate_and_validate_trade_conditions('buy', price_decimals=crypto_exchange.price_decimals)
+
+    # The sell conditions
+    sell_conditions = condition.generate_and_validate_trade_conditions('sell', price_decimals=crypto_exchange.price_decimals)
+
+    # The sell floor (sells everything and stops program)
+    sell_floor = condition.generate_sell_floor(crypto_exchange.price_decimals)
+
+    # Reloads the buy/sell conditions whenever their config files change
+    condition_watcher = condition.ConditionWatcher(buy_conditions, sell_conditions, price_decimals=crypto_exchange.price_decimals)
+    condition_watcher.start()
+
+    # Done generating everything, now the auto-trader will run
+    print('--------------------------------------')
+    print('           Done configuring')
+    print('    The auto-trader is now running')
+    print('--------------------------------------')
+
+    # Runs the trading conditions on every price
+    auto_trader = AutoTrader(crypto_exchange, buy_conditions, sell_conditions, sell_floor, crypto_exchange.get_price())
+
+    #
+    # The main while loop that goes executes the algorithmic trading
+    #
+    while True:
+
+        # If a trade has just been executed
+        if auto_trader.reset:
+
+            # After every trade, the USD balance, crypto balance and request metrics are printed to Account_Holdings.txt
+            account_holdings = open('Account-Holdings.txt', 'a')
+            account_holdings.truncate(0)
+            account_holdings.write('Current balance in USD: '+fixed_point.from_ticks(crypto_exchange.balance, crypto_exchange.price_decimals)+'\n')
+            account_holdings.write('Current balance in '+str(crypto_exchange.coin)+': '+fixed_point.from_ticks(crypto_exchange.crypto_balance, crypto_exchange.size_decimals)+'\n')
+            account_holdings.write(crypto_exchange.scheduler.summary())
+            account_holdings.close()
+
+            # Reset the prices and the conditions
+            auto_trader.start_after_trade(crypto_exchange.get_price())
+
+        # Swap in any changed buy/sell conditions
+        condition_update = condition_watcher.take_update()
+        if condition_update is not None:
+            auto_trader.swap_conditions(condition_update)
+
+        # Pause between getting the prices, longer if the exchange's rate limit is running low
+        sleep(crypto_exchange.scheduler.poll_delay(sleep_time))
+
+        # Get the price of the coin and run the trading conditions on it.
+        # If the price is below the sell floor, everything was sold, so end the program
+        if not auto_trader.tick(crypto_exchange.get_price(), time.time()):
+            return